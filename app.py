@@ -1,6 +1,9 @@
 from flask import Flask, render_template, request, jsonify, flash
 import asyncio
 from gitagent import summarize_repo_with_content
+from path_filters import PathFilter
+from http_cache import cached_json_response, next_result_version
+from deadline import has_no_summary
 import os
 from datetime import datetime
 import hmac
@@ -50,11 +53,20 @@ async def analyze():
 
     try:
         github_token = os.getenv("GITHUB_TOKEN")
-        analysis = await summarize_repo_with_content(repo_url, github_token)
+        filter_fields = {field: request.form.get(field, '').strip() for field in ('include', 'exclude', 'languages')}
+        if any(filter_fields.values()):
+            path_filter = PathFilter.from_dict(filter_fields)
+        else:
+            path_filter = PathFilter.for_repo(repo_url)
+        analysis = await summarize_repo_with_content(repo_url, github_token, path_filter=path_filter)
+        if has_no_summary(analysis):
+            flash('Analysis deadline reached before a summary could be generated. Please try again.', 'error')
+            return render_template('index.html', analyses=analysis_results)
 
         # Store the analysis result
         timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
         analysis_results[repo_url] = {
+            'version': next_result_version(),
             'timestamp': timestamp,
             'result': analysis
         }
@@ -84,10 +96,14 @@ async def webhook():
         repo_url = data["repository"]["html_url"]
         try:
             github_token = os.getenv("GITHUB_TOKEN")
-            analysis = await summarize_repo_with_content(repo_url, github_token)
+            path_filter = PathFilter.for_repo(repo_url)
+            analysis = await summarize_repo_with_content(repo_url, github_token, path_filter=path_filter)
+            if has_no_summary(analysis):
+                return jsonify({"message": "Analysis deadline reached before a summary could be generated"}), 504
 
             timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
             analysis_results[repo_url] = {
+                'version': next_result_version(),
                 'timestamp': timestamp,
                 'result': analysis
             }
@@ -106,8 +122,10 @@ async def webhook():
 
 @app.route('/api/results/<path:repo_url>')
 def get_results(repo_url):
-    if repo_url in analysis_results:
-        return jsonify(analysis_results[repo_url])
+    """Return a stored analysis; supports If-None-Match and `?fields=timestamp,...` projection."""
+    analysis = analysis_results.get(repo_url)
+    if analysis is not None:
+        return cached_json_response(f"results|{repo_url}|{analysis['version']}", lambda: analysis)
     return jsonify({"error": "No analysis found for this repository"}), 404
 
 
@@ -0,0 +1,215 @@
+"""
+Batch analysis of many GitHub repositories.
+
+Reads a JSONL file with one repository per line, e.g.
+
+    {"repo_url": "https://github.com/owner/repo", "exclude": ["docs/", "*.min.js"]}
+
+and appends one JSON result per line to the output file. The output file is
+also the checkpoint: repositories that already have a successful record are
+skipped, so an interrupted run picks up where it stopped when restarted with
+the same arguments. Runs that hit their deadline before any summary was
+generated are recorded as "partial" and analysed again on the next run.
+
+Usage:
+    python batch_analyze.py repos.jsonl -o results.jsonl --concurrency 4
+"""
+import os
+import sys
+import json
+import asyncio
+import argparse
+import aiohttp
+from datetime import datetime
+from gitagent import summarize_repo_with_content, GEMINI_MODEL, HTTP_TIMEOUT
+from deadline import PARTIAL_ANALYSIS_MARKER, has_no_summary
+from rate_limiter import get_rate_limiter
+from path_filters import PathFilter
+
+# Results that summarize_repo_with_content returns instead of a summary
+FAILURE_PREFIXES = (
+    "Invalid GitHub URL",
+    "No files found",
+    "Could not retrieve",
+    "Error",
+)
+
+
+def load_jobs(input_path):
+    """Reads repository jobs from a JSONL file, skipping blank and malformed lines."""
+    jobs = []
+    with open(input_path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError as e:
+                print(f"Skipping line {line_number}: invalid JSON ({e})")
+                continue
+
+            repo_url = entry.get("repo_url") or entry.get("url")
+            if not repo_url:
+                print(f"Skipping line {line_number}: no repo_url")
+                continue
+
+            entry["repo_url"] = repo_url
+            entry.setdefault("id", repo_url)
+            jobs.append(entry)
+    return jobs
+
+
+def load_completed(output_path):
+    """Returns the ids of jobs that already have a successful result in the output file."""
+    completed = set()
+    if not os.path.exists(output_path):
+        return completed
+
+    with open(output_path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a truncated last line; that job simply runs again
+                continue
+            if record.get("status") == "completed":
+                completed.add(record.get("id"))
+    return completed
+
+
+class ResultWriter:
+    """Appends result records to a JSONL file, flushing each one to disk."""
+
+    def __init__(self, output_path):
+        # Start on a new line after a truncated last record, so the next record stays readable
+        needs_newline = False
+        if os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+            with open(output_path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+
+        self._file = open(output_path, 'a', encoding='utf-8')
+        self._lock = asyncio.Lock()
+        if needs_newline:
+            self._file.write("\n")
+
+    async def write(self, record):
+        async with self._lock:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+async def analyze_job(session, job, token, semaphore, writer, deadline_seconds=None):
+    """Analyzes a single repository and records the outcome."""
+    async with semaphore:
+        repo_url = job["repo_url"]
+        print(f"Analyzing repository: {repo_url}")
+        started = datetime.utcnow()
+
+        try:
+            # Filters given on the job line take precedence over the repository's configured filters
+            if any(job.get(field) for field in ("include", "exclude", "languages")):
+                path_filter = PathFilter.from_dict(job)
+            else:
+                path_filter = PathFilter.for_repo(repo_url)
+            result = await summarize_repo_with_content(
+                repo_url, job.get("token") or token, session=session, path_filter=path_filter,
+                deadline_seconds=job.get("deadline_seconds") or deadline_seconds
+            )
+            if not result or result.startswith(FAILURE_PREFIXES):
+                status = "failed"
+            elif has_no_summary(result):
+                status = "partial"
+            else:
+                status = "completed"
+        except Exception as e:
+            result = f"Error during analysis: {e}"
+            status = "failed"
+
+        finished = datetime.utcnow()
+        await writer.write({
+            "id": job["id"],
+            "repo_url": repo_url,
+            "status": status,
+            "partial": status != "failed" and result.startswith(PARTIAL_ANALYSIS_MARKER),
+            "timestamp": finished.strftime('%Y-%m-%d %H:%M:%S UTC'),
+            "duration_seconds": round((finished - started).total_seconds(), 2),
+            "result": result,
+        })
+        print(f"{status.capitalize()}: {repo_url}")
+        return status
+
+
+async def run_batch(input_path, output_path, concurrency=4, fetch_limit=20, llm_concurrency=None, token=None,
+                    deadline_seconds=None):
+    """Analyzes every pending repository in `input_path`, appending results to `output_path`."""
+    jobs = load_jobs(input_path)
+    completed = load_completed(output_path)
+    pending = [job for job in jobs if job["id"] not in completed]
+
+    print(f"{len(jobs)} repositories in batch, {len(completed)} already completed, {len(pending)} to analyze.")
+    if not pending:
+        return {}
+
+    if llm_concurrency:
+        get_rate_limiter(GEMINI_MODEL).concurrency.set_maximum(llm_concurrency)
+
+    # One shared connector caps concurrent GitHub connections across all repositories
+    connector = aiohttp.TCPConnector(limit=fetch_limit)
+    semaphore = asyncio.Semaphore(concurrency)
+    writer = ResultWriter(output_path)
+
+    try:
+        async with aiohttp.ClientSession(connector=connector, timeout=HTTP_TIMEOUT) as session:
+            statuses = await asyncio.gather(*[
+                analyze_job(session, job, token, semaphore, writer, deadline_seconds) for job in pending
+            ])
+    finally:
+        writer.close()
+
+    summary = {}
+    for status in statuses:
+        summary[status] = summary.get(status, 0) + 1
+    return summary
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze a batch of GitHub repositories listed in a JSONL file.")
+    parser.add_argument("input", help="JSONL file with one {\"repo_url\": ...} object per line")
+    parser.add_argument("-o", "--output", default="results.jsonl",
+                        help="JSONL file results are appended to; also used to resume (default: results.jsonl)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Repositories analyzed at the same time")
+    parser.add_argument("--fetch-limit", type=int, default=20, help="Maximum concurrent GitHub connections")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="Maximum concurrent LLM requests")
+    parser.add_argument("--deadline", type=float, default=None,
+                        help="Seconds allowed per repository before a partial result is returned")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Command line entry point for batch analysis."""
+    args = parse_args(argv)
+    try:
+        summary = asyncio.run(run_batch(
+            args.input,
+            args.output,
+            concurrency=args.concurrency,
+            fetch_limit=args.fetch_limit,
+            llm_concurrency=args.llm_concurrency,
+            token=os.getenv("GITHUB_TOKEN"),
+            deadline_seconds=args.deadline,
+        ))
+        print(f"\n===== BATCH COMPLETE =====\n{summary}")
+    except KeyboardInterrupt:
+        print("\nBatch interrupted. Re-run the same command to resume.")
+        return 130
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
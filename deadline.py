@@ -0,0 +1,75 @@
+"""
+End-to-end deadlines for a repository analysis.
+
+A Deadline is created when an analysis starts. Each stage (listing, fetching,
+analysis) gets a share of it via `until()`, and individual awaits are bounded
+with `remaining()`, so a big repository produces a partial result on time
+instead of failing outright.
+"""
+import os
+import time
+
+# End-to-end budget for one analysis, in seconds
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", 120))
+
+# Per-HTTP-request limits; a single slow request cannot eat the whole budget
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 10))
+READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", 30))
+
+# Cumulative share of the budget by which each stage must finish
+LISTING_BUDGET = 0.3
+FETCH_BUDGET = 0.6
+CHUNK_ANALYSIS_BUDGET = 0.85  # Multi-step analyses keep the rest for combining chunk results
+
+# An LLM call is not started with less time than this left; the run returns what it has instead
+LLM_MIN_SECONDS = float(os.getenv("LLM_MIN_SECONDS", 5))
+
+PARTIAL_ANALYSIS_MARKER = "> **Partial analysis**"
+
+# Detail added to the partial note when time ran out before any summary was generated
+NO_SUMMARY_DETAIL = "No summary could be generated in time; these files were retrieved:"
+
+
+class Deadline:
+    """A point in time (on the monotonic clock) by which work must finish."""
+
+    def __init__(self, seconds, start=None):
+        self.start = time.monotonic() if start is None else start
+        self.seconds = seconds
+        self.expires_at = self.start + seconds
+
+    def remaining(self):
+        """Seconds left before the deadline, never negative."""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self):
+        return self.remaining() <= 0
+
+    def until(self, fraction):
+        """A stage deadline ending after `fraction` of this deadline's total budget."""
+        return Deadline(self.seconds * fraction, start=self.start)
+
+    def near(self, margin_seconds):
+        """True once fewer than `margin_seconds` remain."""
+        return self.remaining() < margin_seconds
+
+
+def partial_analysis_note(deadline, coverage, detail=None):
+    """Markdown note prepended to summaries produced after the deadline cut work short."""
+    listing = "complete" if coverage.listing_complete else "incomplete"
+    note = (
+        f"{PARTIAL_ANALYSIS_MARKER}: the {deadline.seconds:.0f}s deadline was reached before the whole "
+        f"repository could be processed. Listed {coverage.listed} files (listing {listing}), "
+        f"fetched {coverage.fetched}, analysed {coverage.analysed}, "
+        f"skipped {coverage.skipped} for lack of time."
+    )
+    if detail:
+        note += f" {detail}"
+    return note + "\n\n"
+
+
+def has_no_summary(result):
+    """True for partial results that list retrieved files but contain no analysis."""
+    note = result.split("\n", 1)[0]
+    return note.startswith(PARTIAL_ANALYSIS_MARKER) and NO_SUMMARY_DETAIL in note
@@ -2,10 +2,18 @@ import os
 import asyncio
 import aiohttp
 import base64
+from contextlib import aclosing
 from urllib.parse import urlparse
-import semantic_kernel as sk
-from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
-from semantic_kernel.functions import KernelArguments
+from providers import get_provider
+from rate_limiter import get_rate_limiter, estimate_tokens
+from path_filters import PathFilter
+from pipeline import PipelineConfig, Coverage, stream_file_contents, pack_chunks, analyse_chunks
+from deadline import (
+    Deadline, ANALYSIS_DEADLINE_SECONDS, CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS,
+    LISTING_BUDGET, FETCH_BUDGET, CHUNK_ANALYSIS_BUDGET, LLM_MIN_SECONDS, partial_analysis_note
+)
+
+OPENAI_MODEL = "gpt-3.5-turbo-16k"  # Using 16k context model
 
 
 async def extract_owner_repo(repo_url):
@@ -44,8 +52,13 @@ async def get_file_content(session, owner, repo, path, token):
         return None
 
 
-async def get_all_files_recursive(session, owner, repo, path, token, max_size=100000):
-    """Recursively retrieves all files from a GitHub repository using aiohttp."""
+async def iter_repo_files(session, owner, repo, path, token, max_size=100000, path_filter=None):
+    """
+    Yields file paths from a GitHub repository as each directory listing arrives.
+
+    Directories rejected by `path_filter` are not walked, and the repository's
+    own .gitignore/.gitattributes rules are loaded as they are encountered.
+    """
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
     headers = {
         "Accept": "application/vnd.github.v3+json"
@@ -53,49 +66,41 @@ async def get_all_files_recursive(session, owner, repo, path, token, max_size=10
     if token:
         headers["Authorization"] = f"token {token}"
 
-    file_list = []
-
     try:
         async with session.get(url, headers=headers) as response:
-            if response.status == 200:
-                items = await response.json()
-
-                if not isinstance(items, list):
-                    items = [items]
-
-                for item in items:
-                    if item["type"] == "file":
-                        if item.get("size", 0) <= max_size and not item["name"].endswith(
-                                (".jpg", ".png", ".gif", ".mp4", ".zip")
-                        ):
-                            file_list.append(item["path"])
-                    elif item["type"] == "dir":
-                        sub_files = await get_all_files_recursive(
-                            session, owner, repo, item["path"], token, max_size
-                        )
-                        file_list.extend(sub_files)
-            else:
+            if response.status != 200:
                 print(f"Error retrieving file list: {response.status}")
+                return
+            items = await response.json()
     except Exception as e:
         print(f"Exception in recursive file retrieval: {e}")
-
-    return file_list
-
-
-async def get_multiple_file_contents(session, owner, repo, file_paths, token):
-    """Fetch multiple file contents concurrently."""
-    tasks = []
-    for file_path in file_paths:
-        task = asyncio.create_task(get_file_content(session, owner, repo, file_path, token))
-        tasks.append((file_path, task))
-
-    file_contents = {}
-    for file_path, task in tasks:
-        content = await task
-        if content:
-            file_contents[file_path] = content
-
-    return file_contents
+        return
+
+    if not isinstance(items, list):
+        items = [items]
+
+    if path_filter and path_filter.respect_repo_rules:
+        for item in items:
+            if item["type"] == "file" and item["name"] in PathFilter.RULE_FILES:
+                rules_text = await get_file_content(session, owner, repo, item["path"], token)
+                if rules_text:
+                    path_filter.add_rules_file(item["path"], rules_text)
+
+    for item in items:
+        if item["type"] == "file":
+            if path_filter and not path_filter.allows_file(item["path"]):
+                continue
+            if item.get("size", 0) <= max_size and not item["name"].endswith(
+                    (".jpg", ".png", ".gif", ".mp4", ".zip")
+            ):
+                yield item["path"]
+        elif item["type"] == "dir":
+            if path_filter and not path_filter.allows_dir(item["path"]):
+                continue
+            async for sub_path in iter_repo_files(
+                    session, owner, repo, item["path"], token, max_size, path_filter
+            ):
+                yield sub_path
 
 
 async def analyze_file_chunk(kernel, repo_url: str, file_chunk: dict):
@@ -142,26 +147,43 @@ async def analyze_file_chunk(kernel, repo_url: str, file_chunk: dict):
         for path, content in file_chunk.items()
     ])
 
-    arguments = KernelArguments(
+    sk = get_provider("semantic-kernel-openai")
+    arguments = sk.KernelArguments(
         repo_url=repo_url,
         file_list=file_list,
         file_contents=file_contents
     )
 
+    limiter = get_rate_limiter(OPENAI_MODEL)
+    estimated_tokens = estimate_tokens(prompt_template + file_list + file_contents)
+
     try:
-        result = await kernel.invoke_prompt(
-            prompt_template,
-            arguments=arguments
+        result = await limiter.run(
+            lambda: kernel.invoke_prompt(prompt_template, arguments=arguments),
+            estimated_tokens=estimated_tokens
         )
         return str(result)
     except Exception as e:
         return f"Error analyzing chunk: {str(e)}"
 
 
-async def analyze_repository(repo_url: str, github_token: str | None = None):
-    """Main function to analyze a GitHub repository."""
+async def analyze_repository(
+        repo_url: str,
+        github_token: str | None = None,
+        path_filter: PathFilter | None = None,
+        deadline_seconds: float | None = None
+):
+    """
+    Main function to analyze a GitHub repository, optionally restricted by a path filter.
+
+    The run is bounded by `deadline_seconds`; when time runs short the chunks
+    analysed so far are combined and the result is marked as partial.
+    """
+    deadline = Deadline(deadline_seconds or ANALYSIS_DEADLINE_SECONDS)
+    coverage = Coverage()
     try:
-        # Initialize Semantic Kernel
+        # Initialize Semantic Kernel (imported on first use)
+        sk = get_provider("semantic-kernel-openai")
         kernel = sk.Kernel()
 
         # Configure OpenAI as AI service
@@ -170,9 +192,9 @@ async def analyze_repository(repo_url: str, github_token: str | None = None):
         if not api_key:
             raise ValueError("OpenAI API key not found")
 
-        chat_service = OpenAIChatCompletion(
+        chat_service = sk.OpenAIChatCompletion(
             service_id="chat-gpt",
-            ai_model_id="gpt-3.5-turbo-16k",  # Using 16k context model
+            ai_model_id=OPENAI_MODEL,
             api_key=api_key
         )
         kernel.add_service(chat_service)
@@ -182,47 +204,44 @@ async def analyze_repository(repo_url: str, github_token: str | None = None):
         if not owner or not repo:
             return "Invalid GitHub URL format."
 
-        # Set up HTTP session
-        timeout = aiohttp.ClientTimeout(total=60)
+        # Set up HTTP session with per-request connect/read timeouts
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT_SECONDS, sock_read=READ_TIMEOUT_SECONDS)
         async with aiohttp.ClientSession(timeout=timeout) as session:
-            print(f"Fetching files from {owner}/{repo}...")
-
-            # Get list of files
-            file_list = await get_all_files_recursive(session, owner, repo, "", github_token)
-            if not file_list:
-                return "No files found or access denied."
-
-            print(f"Found {len(file_list)} files. Fetching contents...")
-
-            # Get file contents
-            file_contents = await get_multiple_file_contents(
-                session, owner, repo, file_list, github_token
+            print(f"Streaming files from {owner}/{repo}...")
+
+            # Files flow list -> fetch -> pack -> analyse; each chunk is analysed as soon as it fills
+            config = PipelineConfig.from_env(max_files_per_chunk=3)  # Analyze 3 files at a time
+            paths = iter_repo_files(session, owner, repo, "", github_token, config.max_file_size, path_filter)
+            fetch = lambda path: get_file_content(session, owner, repo, path, github_token)
+            files = stream_file_contents(
+                paths, fetch, config,
+                listing_deadline=deadline.until(LISTING_BUDGET),
+                fetch_deadline=deadline.until(FETCH_BUDGET),
+                coverage=coverage
             )
-            if not file_contents:
-                return "Could not retrieve file contents."
-
-            print(f"Successfully retrieved {len(file_contents)} files. Analyzing in chunks...")
-
-            # Split files into chunks to handle token limits
-            chunk_size = 3  # Analyze 3 files at a time
-            file_chunks = []
-            current_chunk = {}
 
-            for i, (path, content) in enumerate(file_contents.items()):
-                current_chunk[path] = content
-                if (i + 1) % chunk_size == 0:
-                    file_chunks.append(current_chunk)
-                    current_chunk = {}
+            async with aclosing(files):
+                async with aclosing(pack_chunks(files, config)) as chunks:
+                    analyses = await analyse_chunks(
+                        chunks,
+                        lambda chunk: analyze_file_chunk(kernel, repo_url, chunk),
+                        config,
+                        deadline=deadline.until(CHUNK_ANALYSIS_BUDGET),
+                        coverage=coverage
+                    )
+
+            if not analyses:
+                if coverage.partial:
+                    return f"Analysis failed: nothing could be analysed within the {deadline.seconds:.0f}s deadline."
+                return "No files found or access denied."
 
-            if current_chunk:
-                file_chunks.append(current_chunk)
+            print(f"Analyzed {len(analyses)} chunks. Combining results...")
 
-            # Analyze each chunk
-            analyses = []
-            for i, chunk in enumerate(file_chunks):
-                print(f"Analyzing chunk {i + 1} of {len(file_chunks)}...")
-                chunk_analysis = await analyze_file_chunk(kernel, repo_url, chunk)
-                analyses.append(chunk_analysis)
+            # Without time to combine, the chunk analyses themselves are the result
+            uncombined_note = "The per-chunk analyses below could not be combined in time."
+            if deadline.near(LLM_MIN_SECONDS):
+                print("Deadline is near; returning chunk analyses without combining them.")
+                return partial_analysis_note(deadline, coverage, uncombined_note) + "\n\n".join(analyses)
 
             # Combine the analyses
             final_prompt = f"""
@@ -241,12 +260,21 @@ async def analyze_repository(repo_url: str, github_token: str | None = None):
             Format using markdown for readability.
             """
 
-            arguments = KernelArguments(prompt=final_prompt)
-            final_analysis = await kernel.invoke_prompt(
-                final_prompt,
-                arguments=arguments
-            )
-
+            arguments = sk.KernelArguments(prompt=final_prompt)
+            try:
+                final_analysis = await asyncio.wait_for(
+                    get_rate_limiter(OPENAI_MODEL).run(
+                        lambda: kernel.invoke_prompt(final_prompt, arguments=arguments),
+                        prompt=final_prompt
+                    ),
+                    deadline.remaining()
+                )
+            except asyncio.TimeoutError:
+                print("Deadline reached while combining; returning chunk analyses.")
+                return partial_analysis_note(deadline, coverage, uncombined_note) + "\n\n".join(analyses)
+
+            if coverage.partial:
+                return partial_analysis_note(deadline, coverage) + str(final_analysis)
             return str(final_analysis)
 
     except Exception as e:
@@ -3,14 +3,22 @@ import asyncio
 import aiohttp
 import base64
 import json
+from contextlib import aclosing
 from urllib.parse import urlparse
-import google.generativeai as genai
-import semantic_kernel as sk
-from semantic_kernel.connectors.ai.google.google_ai import GoogleAIChatCompletion
-from semantic_kernel.kernel import KernelArguments
+from providers import get_provider
+from rate_limiter import get_rate_limiter
+from path_filters import PathFilter
+from pipeline import PipelineConfig, Coverage, stream_file_contents
+from deadline import (
+    Deadline, ANALYSIS_DEADLINE_SECONDS, CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS,
+    LISTING_BUDGET, FETCH_BUDGET, LLM_MIN_SECONDS, NO_SUMMARY_DETAIL, partial_analysis_note
+)
 
-# Configure your Gemini API key
-genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+GEMINI_MODEL = 'gemini-1.5-pro'
+MAX_PROMPT_SIZE = 100000  # Adjust based on Gemini's limitations
+
+# Per-request connect/read timeouts; the overall budget is enforced by a Deadline
+HTTP_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=CONNECT_TIMEOUT_SECONDS, sock_read=READ_TIMEOUT_SECONDS)
 
 def extract_owner_repo(repo_url):
     """Extracts owner and repository names from a GitHub URL."""
@@ -47,8 +55,27 @@ async def get_github_repo_info(session, repo_url, token=None):
     except Exception as e:
         return None, f"An error occurred: {e}"
 
-async def get_file_content(session, owner, repo, path, token):
-    """Retrieves file content from a GitHub repository using aiohttp."""
+async def get_head_commit_sha(session, owner, repo, token):
+    """Returns the SHA of the default branch's head commit, or None on failure."""
+    url = f"https://api.github.com/repos/{owner}/{repo}/commits/HEAD"
+    headers = {
+        "Accept": "application/vnd.github.sha"
+    }
+    if token:
+        headers["Authorization"] = f"token {token}"
+
+    try:
+        async with session.get(url, headers=headers) as response:
+            if response.status == 200:
+                return (await response.text()).strip()
+            print(f"Error retrieving head commit: {response.status}")
+            return None
+    except Exception as e:
+        print(f"Exception retrieving head commit: {e}")
+        return None
+
+async def get_file_content(session, owner, repo, path, token, ref=None):
+    """Retrieves file content from a GitHub repository using aiohttp, at `ref` if given."""
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
     headers = {
         "Accept": "application/vnd.github.v3+json"
@@ -56,8 +83,10 @@ async def get_file_content(session, owner, repo, path, token):
     if token:
         headers["Authorization"] = f"token {token}"
 
+    params = {"ref": ref} if ref else None
+
     try:
-        async with session.get(url, headers=headers) as response:
+        async with session.get(url, headers=headers, params=params) as response:
             if response.status == 200:
                 content_json = await response.json()
                 if isinstance(content_json, dict) and "content" in content_json:
@@ -77,8 +106,14 @@ async def get_file_content(session, owner, repo, path, token):
         print(f"Exception retrieving {path}: {e}")
         return None
 
-async def get_all_files_recursive(session, owner, repo, path, token, max_size=100000):
-    """Recursively retrieves all files from a GitHub repository using aiohttp."""
+async def iter_repo_files(session, owner, repo, path, token, max_size=100000, path_filter=None, ref=None):
+    """
+    Yields file paths from a GitHub repository as each directory listing arrives.
+
+    Directories rejected by `path_filter` are not walked, and the repository's
+    own .gitignore/.gitattributes rules are loaded as they are encountered.
+    Pass `ref` to list a specific commit instead of the default branch.
+    """
     url = f"https://api.github.com/repos/{owner}/{repo}/contents/{path}"
     headers = {
         "Accept": "application/vnd.github.v3+json"
@@ -86,50 +121,58 @@ async def get_all_files_recursive(session, owner, repo, path, token, max_size=10
     if token:
         headers["Authorization"] = f"token {token}"
 
-    file_list = []
+    params = {"ref": ref} if ref else None
 
     try:
-        async with session.get(url, headers=headers) as response:
+        async with session.get(url, headers=headers, params=params) as response:
             if response.status == 200:
                 items = await response.json()
-
-                # Handle case when response is a file, not a directory
-                if not isinstance(items, list):
-                    items = [items]
-
-                for item in items:
-                    if item["type"] == "file":
-                        # Skip large files and binary files that are likely not code
-                        if item.get("size", 0) <= max_size and not item["name"].endswith((".jpg", ".png", ".gif", ".mp4", ".zip")):
-                            file_list.append(item["path"])
-                    elif item["type"] == "dir":
-                        sub_files = await get_all_files_recursive(session, owner, repo, item["path"], token, max_size)
-                        file_list.extend(sub_files)
             else:
                 error_text = await response.text()
                 print(f"Error retrieving file list: {response.status} - {error_text}")
+                return
     except Exception as e:
         print(f"Exception in recursive file retrieval: {e}")
-
-    return file_list
-
-async def get_multiple_file_contents(session, owner, repo, file_paths, token):
-    """Fetch multiple file contents concurrently."""
-    tasks = []
-    for file_path in file_paths:
-        task = asyncio.create_task(get_file_content(session, owner, repo, file_path, token))
-        tasks.append((file_path, task))
-
-    file_contents = {}
-    for file_path, task in tasks:
-        content = await task
-        if content:
-            file_contents[file_path] = content
-
-    return file_contents
+        return
+
+    # Handle case when response is a file, not a directory
+    if not isinstance(items, list):
+        items = [items]
+
+    # Load this directory's ignore/attribute rules before deciding on its entries
+    if path_filter and path_filter.respect_repo_rules:
+        for item in items:
+            if item["type"] == "file" and item["name"] in PathFilter.RULE_FILES:
+                rules_text = await get_file_content(session, owner, repo, item["path"], token, ref)
+                if rules_text:
+                    path_filter.add_rules_file(item["path"], rules_text)
+
+    for item in items:
+        if item["type"] == "file":
+            if path_filter and not path_filter.allows_file(item["path"]):
+                continue
+            # Skip large files and binary files that are likely not code
+            if item.get("size", 0) <= max_size and not item["name"].endswith((".jpg", ".png", ".gif", ".mp4", ".zip")):
+                yield item["path"]
+        elif item["type"] == "dir":
+            if path_filter and not path_filter.allows_dir(item["path"]):
+                continue
+            async for sub_path in iter_repo_files(
+                    session, owner, repo, item["path"], token, max_size, path_filter, ref
+            ):
+                yield sub_path
+
+async def generate_text(prompt, model_name=GEMINI_MODEL):
+    """Generates text with Gemini, throttled by the process-wide rate limiter for the model."""
+    # The Gemini SDK is imported and configured on first use, not when this module loads
+    genai = get_provider("gemini")
+    model = genai.GenerativeModel(model_name)
+    limiter = get_rate_limiter(model_name)
+    response = await limiter.run(lambda: model.generate_content_async(prompt), prompt=prompt)
+    return response.text
 
 # Placeholder for Semantic Kernel Orchestration
-async def orchestrate_analysis(repo_url, file_contents):
+async def orchestrate_analysis(repo_url, file_contents, files_omitted=False):
     """
     Placeholder for Semantic Kernel orchestration.  Currently uses Gemini
     directly, but will be replaced with SK logic.
@@ -152,18 +195,20 @@ async def orchestrate_analysis(repo_url, file_contents):
 
     # Add file contents to prompt, limiting total size
     total_content_size = 0
-    max_prompt_size = 100000  # Adjust based on Gemini's limitations
 
     for file_path, content in file_contents.items():
         file_section = f"\n--- {file_path} ---\n{content}\n"
-        if total_content_size + len(file_section) < max_prompt_size:
+        if total_content_size + len(file_section) < MAX_PROMPT_SIZE:
             summary_prompt += file_section
             total_content_size += len(file_section)
         else:
-            # Add a note that some files were omitted
-            summary_prompt += f"\n[Additional {len(file_contents) - len(summary_prompt.split('---')) + 1} files omitted due to size constraints]"
+            files_omitted = True
             break
 
+    if files_omitted:
+        # Add a note that some files were omitted
+        summary_prompt += "\n[Additional files omitted due to size constraints]"
+
     # Generate summary with Gemini
     try:
         # --- Azure OpenAI Replacement Start ---
@@ -180,42 +225,91 @@ async def orchestrate_analysis(repo_url, file_contents):
         # )
         # return response['choices'][0]['message']['content']
         # --- Azure OpenAI Replacement End ---
-        model = genai.GenerativeModel('gemini-1.5-pro')
-        response = model.generate_content(summary_prompt)
-        return response.text
+        return await generate_text(summary_prompt)
     except Exception as e:
         return f"Error generating summary: {e}"
 
-async def summarize_repo_with_content(repo_url, token=None):
-    """Summarizes a GitHub repository with file contents."""
+async def summarize_repo_with_content(repo_url, token=None, session=None, path_filter=None, deadline_seconds=None):
+    """
+    Summarizes a GitHub repository with file contents.
+
+    Pass an existing `session` to share its connection pool (and connection
+    limit) across several analyses, and a `path_filter` to restrict which
+    paths are listed and fetched. The whole run is bounded by
+    `deadline_seconds` (ANALYSIS_DEADLINE_SECONDS by default); if it runs
+    short, the files gathered so far are summarized and the result is marked
+    as partial.
+    """
+    deadline = Deadline(deadline_seconds or ANALYSIS_DEADLINE_SECONDS)
     owner, repo = extract_owner_repo(repo_url)
     if not owner or not repo:
         return "Invalid GitHub URL format."
 
-    # Use a timeout to prevent hanging on slow connections
-    timeout = aiohttp.ClientTimeout(total=60)
-
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        # Get repository file structure
-        print(f"Retrieving files from {owner}/{repo}...")
-        file_list = await get_all_files_recursive(session, owner, repo, "", token)
+    if session is not None:
+        return await _summarize_with_session(session, repo_url, owner, repo, token, path_filter, deadline)
 
-        if not file_list:
-            return "No files found or access denied. Please check your token and repository URL."
+    async with aiohttp.ClientSession(timeout=HTTP_TIMEOUT) as session:
+        return await _summarize_with_session(session, repo_url, owner, repo, token, path_filter, deadline)
 
-        print(f"Found {len(file_list)} files. Fetching contents...")
-
-        # Get file contents with improved concurrency
-        file_contents = await get_multiple_file_contents(session, owner, repo, file_list, token)
+async def _summarize_with_session(session, repo_url, owner, repo, token, path_filter, deadline):
+    """Streams a repository's files into the prompt and summarizes it using an open session."""
+    config = PipelineConfig.from_env()
+    coverage = Coverage()
+    file_contents = {}
+    prompt_size = 0
+    files_omitted = False
+
+    print(f"Streaming files from {owner}/{repo}...")
+    paths = iter_repo_files(session, owner, repo, "", token, config.max_file_size, path_filter)
+    fetch = lambda path: get_file_content(session, owner, repo, path, token)
+    files = stream_file_contents(
+        paths, fetch, config,
+        listing_deadline=deadline.until(LISTING_BUDGET),
+        fetch_deadline=deadline.until(FETCH_BUDGET),
+        coverage=coverage
+    )
+
+    # Stop fetching as soon as the prompt is full; later files would be dropped anyway
+    async with aclosing(files):
+        async for file_path, content in files:
+            section_size = len(f"\n--- {file_path} ---\n{content}\n")
+            if prompt_size + section_size >= MAX_PROMPT_SIZE:
+                files_omitted = True
+                break
+            file_contents[file_path] = content
+            prompt_size += section_size
 
-        if not file_contents:
-            return "Could not retrieve any file contents. Please check permissions."
+    if not file_contents:
+        if coverage.partial:
+            return f"Error: no files could be retrieved within the {deadline.seconds:.0f}s deadline."
+        return "No files found or access denied. Please check your token and repository URL."
 
-        print(f"Successfully retrieved {len(file_contents)} file contents. Generating summary...")
+    coverage.analysed = len(file_contents)
+    print(f"Successfully retrieved {len(file_contents)} file contents. Generating summary...")
 
-        # Orchestrate the analysis using the placeholder function
-        summary = await orchestrate_analysis(repo_url, file_contents)
-        return summary
+    # Orchestrate the analysis using the placeholder function
+    if deadline.near(LLM_MIN_SECONDS):
+        print("Deadline is near; skipping summary generation.")
+        return _unsummarized_result(deadline, coverage, file_contents)
+    try:
+        summary = await asyncio.wait_for(
+            orchestrate_analysis(repo_url, file_contents, files_omitted),
+            deadline.remaining()
+        )
+    except asyncio.TimeoutError:
+        print("Deadline reached while generating the summary.")
+        return _unsummarized_result(deadline, coverage, file_contents)
+
+    if coverage.partial and not summary.startswith("Error"):
+        summary = partial_analysis_note(deadline, coverage) + summary
+    return summary
+
+def _unsummarized_result(deadline, coverage, file_contents):
+    """Partial result listing the retrieved files when no summary could be generated in time."""
+    coverage.skipped += coverage.analysed
+    coverage.analysed = 0
+    file_list = "\n".join(f"- {file_path}" for file_path in file_contents)
+    return partial_analysis_note(deadline, coverage, NO_SUMMARY_DETAIL) + file_list
 
 async def main():
     """Main function to summarize a GitHub repository."""
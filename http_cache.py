@@ -0,0 +1,113 @@
+"""
+Cheap polling responses for analysis results.
+
+Every stored result carries a version made of a random per-process boot id and
+a counter, so versions never repeat across restarts or between workers. JSON
+responses get a strong ETag derived from that version (plus the requested fields and
+encoding), so a poller sending If-None-Match gets an empty 304 without the
+result being serialized at all. Callers can ask for a subset of fields with
+`?fields=status,result.timestamp`, and large bodies are gzipped when the
+client accepts it.
+"""
+import gzip
+import json
+import hashlib
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
+from flask import request, make_response
+
+GZIP_MIN_BYTES = 1024
+BODY_CACHE_SIZE = 256
+
+_BOOT_ID = uuid.uuid4().hex
+_versions = itertools.count(1)
+_versions_lock = threading.Lock()
+_body_cache = OrderedDict()
+_body_cache_lock = threading.Lock()
+
+
+def next_result_version():
+    """Returns a new result version, unique across processes and restarts."""
+    with _versions_lock:
+        return f"{_BOOT_ID}-{next(_versions)}"
+
+
+def requested_fields():
+    """Parses the `fields` query parameter into a tuple of (possibly dotted) field names."""
+    fields = request.args.get('fields', '')
+    return tuple(sorted({field.strip() for field in fields.split(',') if field.strip()}))
+
+
+def project(payload, fields):
+    """Keeps only the requested fields; `a.b` selects key b inside a nested dict a."""
+    if not fields:
+        return payload
+
+    projected = {}
+    for field in fields:
+        key, _, rest = field.partition('.')
+        if key not in payload:
+            continue
+        if rest and isinstance(payload[key], dict):
+            nested = project(payload[key], (rest,))
+            projected.setdefault(key, {}).update(nested)
+        else:
+            projected[key] = payload[key]
+    return projected
+
+
+def _encode_body(etag, build_payload, fields, use_gzip):
+    with _body_cache_lock:
+        body = _body_cache.get(etag)
+        if body is not None:
+            _body_cache.move_to_end(etag)
+            return body
+
+    body = json.dumps(project(build_payload(), fields), separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+    if use_gzip:
+        body = gzip.compress(body, compresslevel=6)
+
+    with _body_cache_lock:
+        _body_cache[etag] = body
+        while len(_body_cache) > BODY_CACHE_SIZE:
+            _body_cache.popitem(last=False)
+    return body
+
+
+def cached_json_response(version_key, build_payload):
+    """
+    Builds a compact JSON response for the current request.
+
+    `version_key` must change whenever the payload changes; `build_payload`
+    is only called when a body actually has to be sent.
+    """
+    fields = requested_fields()
+    base_tag = hashlib.sha256(f"{version_key}|{','.join(fields)}".encode('utf-8')).hexdigest()[:32]
+    gzip_tag = f"{base_tag}-gzip"
+
+    # Answer revalidations before doing any serialization work; If-None-Match uses weak comparison
+    for tag in (base_tag, gzip_tag):
+        if request.if_none_match.contains_weak(tag):
+            response = make_response('', 304)
+            response.set_etag(tag)
+            response.headers['Cache-Control'] = 'no-cache'
+            response.vary.add('Accept-Encoding')
+            return response
+
+    accepts_gzip = request.accept_encodings['gzip'] > 0
+    body = _encode_body(base_tag, build_payload, fields, use_gzip=False)
+    etag = base_tag
+    if accepts_gzip and len(body) >= GZIP_MIN_BYTES:
+        body = _encode_body(gzip_tag, build_payload, fields, use_gzip=True)
+        etag = gzip_tag
+
+    response = make_response(body, 200)
+    response.mimetype = 'application/json'
+    if etag == gzip_tag:
+        response.headers['Content-Encoding'] = 'gzip'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Accept-Encoding')
+    return response
@@ -0,0 +1,270 @@
+"""
+Path filtering applied while a repository is being listed.
+
+A PathFilter combines user include/exclude globs, a language allow-list and
+the repository's own .gitignore / .gitattributes (linguist-generated and
+linguist-vendored) rules. Directories it rejects are never walked and files it
+rejects are never downloaded.
+"""
+import os
+import re
+import json
+import posixpath
+
+# Language names accepted in allow-lists, mapped to file extensions
+LANGUAGE_EXTENSIONS = {
+    "python": (".py", ".pyi"),
+    "javascript": (".js", ".jsx", ".mjs", ".cjs"),
+    "typescript": (".ts", ".tsx"),
+    "java": (".java",),
+    "kotlin": (".kt", ".kts"),
+    "scala": (".scala",),
+    "go": (".go",),
+    "rust": (".rs",),
+    "c": (".c", ".h"),
+    "cpp": (".cpp", ".cc", ".cxx", ".hpp", ".hh", ".hxx"),
+    "csharp": (".cs",),
+    "ruby": (".rb",),
+    "php": (".php",),
+    "swift": (".swift",),
+    "shell": (".sh", ".bash"),
+    "html": (".html", ".htm"),
+    "css": (".css", ".scss", ".sass"),
+    "sql": (".sql",),
+    "markdown": (".md",),
+    "yaml": (".yml", ".yaml"),
+    "json": (".json",),
+}
+
+LINGUIST_EXCLUDED_ATTRIBUTES = ("linguist-generated", "linguist-vendored")
+
+# JSON file mapping repository URLs to filter settings for webhook-triggered analyses
+PATH_FILTERS_FILE = os.getenv("PATH_FILTERS_FILE", "path_filters.json")
+
+
+def glob_to_regex(pattern):
+    """Translates a gitignore-style glob (supporting **) into a regex source string."""
+    regex = ""
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            regex += "(?:.*/)?"
+            i += 3
+            continue
+        if pattern.startswith("/**", i) and i + 3 == len(pattern):
+            regex += "(?:/.*)?"
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            regex += ".*"
+            i += 2
+            continue
+        if char == "*":
+            regex += "[^/]*"
+        elif char == "?":
+            regex += "[^/]"
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                regex += re.escape(char)
+            else:
+                body = pattern[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                regex += f"[{body}]"
+                i = end
+        else:
+            regex += re.escape(char)
+        i += 1
+    return regex
+
+
+class PathRule:
+    """A single gitignore-style pattern, optionally scoped to a base directory."""
+
+    def __init__(self, pattern, base=""):
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+
+        # Patterns containing a slash are relative to the base; others match at any depth
+        self.anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+        prefix = re.escape(base + "/") if base else ""
+        if not self.anchored:
+            prefix += "(?:.*/)?"
+        self.regex = re.compile(prefix + glob_to_regex(pattern) + "$")
+
+        # Leading path segments, used to tell whether a directory can contain a match
+        self.base_segments = base.split("/") if base else []
+        self.segments = pattern.split("/")
+
+    def matches(self, path, is_dir=False):
+        if self.dir_only and not is_dir:
+            return False
+        return bool(self.regex.match(path))
+
+    def matches_path_or_parent(self, path, is_dir=False):
+        """True if the rule matches the path itself or any directory containing it."""
+        if self.matches(path, is_dir):
+            return True
+        return any(self.matches(parent, is_dir=True) for parent in _parent_dirs(path))
+
+    def could_match_under(self, dir_path):
+        """False only if no path inside `dir_path` can match this rule."""
+        if not self.anchored or self.matches_path_or_parent(dir_path, is_dir=True):
+            return True
+
+        parts = dir_path.split("/")
+        for i, part in enumerate(parts):
+            if i < len(self.base_segments):
+                if part != self.base_segments[i]:
+                    return False
+                continue
+            segment_index = i - len(self.base_segments)
+            if segment_index >= len(self.segments):
+                return False
+            segment = self.segments[segment_index]
+            if segment == "**":
+                return True
+            if not re.fullmatch(glob_to_regex(segment), part):
+                return False
+        return True
+
+
+def _parent_dirs(path):
+    """Yields the directories containing `path`, nearest first."""
+    path = posixpath.dirname(path)
+    while path:
+        yield path
+        path = posixpath.dirname(path)
+
+
+def _last_match(rules, path, is_dir):
+    """Returns the value of the last rule matching `path`, or None. Later rules win, as in git."""
+    result = None
+    for rule, value in rules:
+        if rule.matches(path, is_dir):
+            result = value
+    return result
+
+
+def _split_patterns(value):
+    """Accepts a list or a comma/newline separated string of patterns."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = re.split(r"[,\n]", value)
+    return [item.strip() for item in value if item and item.strip()]
+
+
+class PathFilter:
+    """Decides which repository paths are listed and fetched."""
+
+    RULE_FILES = (".gitignore", ".gitattributes")
+
+    def __init__(self, include=None, exclude=None, languages=None, respect_repo_rules=True):
+        include, exclude = _split_patterns(include), _split_patterns(exclude)
+        self.include = [PathRule(pattern) for pattern in include]
+        self.exclude = [PathRule(pattern) for pattern in exclude]
+        self.extensions = self._language_extensions(_split_patterns(languages))
+        self.respect_repo_rules = respect_repo_rules
+        # Identifies the configured settings (not rules loaded from the repository), e.g. for cache keys
+        self.settings_key = (
+            tuple(sorted(include)), tuple(sorted(exclude)), tuple(sorted(self.extensions)), respect_repo_rules
+        )
+        self._ignore_rules = []
+        self._attribute_rules = []
+
+    @staticmethod
+    def _language_extensions(languages):
+        extensions = []
+        for language in languages:
+            language = language.lower()
+            if language.startswith("."):
+                extensions.append(language)
+            elif language in LANGUAGE_EXTENSIONS:
+                extensions.extend(LANGUAGE_EXTENSIONS[language])
+            else:
+                raise ValueError(f"Unknown language '{language}'. Known languages: {', '.join(sorted(LANGUAGE_EXTENSIONS))}")
+        return tuple(extensions)
+
+    @classmethod
+    def from_dict(cls, config):
+        """Builds a filter from a dict with optional include, exclude, languages and respect_repo_rules keys."""
+        config = config or {}
+        return cls(
+            include=config.get("include"),
+            exclude=config.get("exclude"),
+            languages=config.get("languages"),
+            respect_repo_rules=config.get("respect_repo_rules", True),
+        )
+
+    @classmethod
+    def for_repo(cls, repo_url, config_path=PATH_FILTERS_FILE):
+        """Builds the filter configured for a repository in PATH_FILTERS_FILE (or a default filter)."""
+        repo_config = {}
+        if config_path and os.path.exists(config_path):
+            with open(config_path, encoding='utf-8') as f:
+                all_configs = json.load(f)
+            repo_config = all_configs.get(repo_url.rstrip("/")) or all_configs.get("default") or {}
+        return cls.from_dict(repo_config)
+
+    def add_rules_file(self, path, text):
+        """Loads a .gitignore or .gitattributes file found at `path` in the repository."""
+        base = posixpath.dirname(path)
+        name = posixpath.basename(path)
+        if name == ".gitignore":
+            self.add_gitignore(text, base)
+        elif name == ".gitattributes":
+            self.add_gitattributes(text, base)
+
+    def add_gitignore(self, text, base=""):
+        for line in text.splitlines():
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            rule = PathRule(line, base)
+            self._ignore_rules.append((rule, not rule.negate))
+
+    def add_gitattributes(self, text, base=""):
+        for line in text.splitlines():
+            parts = line.split()
+            if not parts or parts[0].startswith("#"):
+                continue
+            pattern, attributes = parts[0], parts[1:]
+            for attribute in attributes:
+                name, _, value = attribute.lstrip("-!").partition("=")
+                if name not in LINGUIST_EXCLUDED_ATTRIBUTES:
+                    continue
+                excluded = not attribute.startswith(("-", "!")) and value.lower() not in ("false", "0")
+                self._attribute_rules.append((PathRule(pattern, base), excluded))
+
+    def _excluded(self, path, is_dir):
+        if any(rule.matches(path, is_dir) for rule in self.exclude):
+            return True
+        if _last_match(self._ignore_rules, path, is_dir):
+            return True
+        return bool(_last_match(self._attribute_rules, path, is_dir))
+
+    def allows_dir(self, path):
+        """Returns False for directories whose whole subtree should be skipped."""
+        if self._excluded(path, is_dir=True):
+            return False
+        # Skip directories that no include pattern can reach, so they are never listed
+        if self.include and not any(rule.could_match_under(path) for rule in self.include):
+            return False
+        return True
+
+    def allows_file(self, path):
+        """Returns True if a file should be fetched and analysed."""
+        if self._excluded(path, is_dir=False):
+            return False
+        if self.extensions and not path.lower().endswith(self.extensions):
+            return False
+        if self.include and not any(rule.matches_path_or_parent(path) for rule in self.include):
+            return False
+        return True
@@ -0,0 +1,253 @@
+"""
+Streaming stages for repository analysis: list -> fetch -> pack -> analyse.
+
+Stages are connected by bounded asyncio queues, so a slow consumer pauses the
+stages feeding it instead of letting fetched files pile up in memory. The
+amount of file content held at once is bounded by PipelineConfig, not by the
+size of the repository.
+
+Optional stage deadlines stop listing, fetching or analysis early; what was
+processed is recorded in a Coverage object so callers can report a partial
+result.
+"""
+import os
+import re
+import asyncio
+from dataclasses import dataclass
+
+_DONE = object()
+
+# Files larger than one chunk are split; each piece is labelled "<path> (part i of n)"
+_PART_LABEL = re.compile(r"^(?P<path>.*) \(part (?P<index>\d+) of (?P<total>\d+)\)$")
+
+
+@dataclass
+class PipelineConfig:
+    """Limits for a streaming analysis run."""
+    max_file_size: int = 100000      # Files larger than this are skipped while listing
+    fetch_concurrency: int = 8       # Concurrent file downloads
+    buffer_size: int = 16            # Items queued between stages
+    max_chunk_chars: int = 20000     # Content characters packed into one chunk
+    max_files_per_chunk: int = 0     # 0 means limited only by max_chunk_chars
+    max_chunks_in_flight: int = 4    # Chunks being analysed at the same time
+
+    @classmethod
+    def from_env(cls, **overrides):
+        """Builds a config from PIPELINE_* environment variables, then applies overrides."""
+        values = {}
+        for name in cls.__dataclass_fields__:
+            env_value = os.getenv(f"PIPELINE_{name.upper()}")
+            if env_value is not None:
+                values[name] = int(env_value)
+        values.update(overrides)
+        return cls(**values)
+
+
+@dataclass
+class Coverage:
+    """How much of a repository a run actually processed."""
+    listed: int = 0
+    fetched: int = 0
+    analysed: int = 0
+    skipped: int = 0                 # Listed files dropped because a stage ran out of time
+    listing_complete: bool = True
+
+    @property
+    def partial(self):
+        return not self.listing_complete or self.skipped > 0
+
+
+async def stream_file_contents(paths, fetch, config=None, listing_deadline=None, fetch_deadline=None, coverage=None):
+    """
+    Fetches files concurrently as their paths are listed, yielding
+    (path, content) pairs in completion order.
+
+    `paths` is an async iterable of file paths and `fetch` a coroutine
+    function returning a file's content (or None to skip it). Listing stops
+    at `listing_deadline` and fetching at `fetch_deadline`; progress is
+    recorded in `coverage`.
+    """
+    config = config or PipelineConfig()
+    coverage = coverage if coverage is not None else Coverage()
+    path_queue = asyncio.Queue(config.buffer_size)
+    content_queue = asyncio.Queue(config.buffer_size)
+
+    async def list_paths():
+        iterator = aiter(paths)
+        try:
+            while True:
+                if listing_deadline is None:
+                    path = await anext(iterator, _DONE)
+                else:
+                    path = await asyncio.wait_for(anext(iterator, _DONE), listing_deadline.remaining())
+                if path is _DONE:
+                    break
+                coverage.listed += 1
+                await path_queue.put(path)
+        except asyncio.TimeoutError:
+            print("Listing deadline reached; continuing with the files found so far.")
+            coverage.listing_complete = False
+        except Exception as e:
+            print(f"Exception while listing files: {e}")
+            coverage.listing_complete = False
+        for _ in range(config.fetch_concurrency):
+            await path_queue.put(_DONE)
+
+    async def fetch_contents():
+        while True:
+            path = await path_queue.get()
+            if path is _DONE:
+                await content_queue.put(_DONE)
+                return
+            if fetch_deadline is not None and fetch_deadline.expired:
+                # Keep draining so listing never blocks, but stop downloading
+                coverage.skipped += 1
+                continue
+            try:
+                if fetch_deadline is None:
+                    content = await fetch(path)
+                else:
+                    content = await asyncio.wait_for(fetch(path), fetch_deadline.remaining())
+            except asyncio.TimeoutError:
+                coverage.skipped += 1
+                content = None
+            except Exception as e:
+                print(f"Exception retrieving {path}: {e}")
+                content = None
+            if content:
+                coverage.fetched += 1
+                await content_queue.put((path, content))
+
+    tasks = [asyncio.create_task(list_paths())]
+    tasks += [asyncio.create_task(fetch_contents()) for _ in range(config.fetch_concurrency)]
+
+    try:
+        running = config.fetch_concurrency
+        while running:
+            item = await content_queue.get()
+            if item is _DONE:
+                running -= 1
+            else:
+                yield item
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def split_content(content, max_chars):
+    """Splits content into pieces of at most `max_chars`, breaking after a newline where possible."""
+    pieces = []
+    while len(content) > max_chars:
+        cut = content.rfind("\n", 0, max_chars) + 1 or max_chars
+        pieces.append(content[:cut])
+        content = content[cut:]
+    if content or not pieces:
+        pieces.append(content)
+    return pieces
+
+
+def part_label(path, index, total):
+    return f"{path} (part {index} of {total})"
+
+
+def source_file(label):
+    """Returns (path, part index, part count) for a chunk key produced by pack_chunks."""
+    match = _PART_LABEL.match(label)
+    if match:
+        return match.group("path"), int(match.group("index")), int(match.group("total"))
+    return label, 1, 1
+
+
+async def pack_chunks(files, config=None):
+    """
+    Groups (path, content) pairs into chunk dicts, yielding each one as soon as it is full.
+
+    A file larger than `max_chunk_chars` is split into several pieces, keyed
+    by part_label(), so no content is dropped.
+    """
+    config = config or PipelineConfig()
+    chunk = {}
+    chunk_size = 0
+
+    async for path, content in files:
+        pieces = split_content(content, config.max_chunk_chars)
+        for index, piece in enumerate(pieces, 1):
+            label = path if len(pieces) == 1 else part_label(path, index, len(pieces))
+            chunk_full = chunk_size + len(piece) > config.max_chunk_chars
+            if config.max_files_per_chunk and len(chunk) >= config.max_files_per_chunk:
+                chunk_full = True
+
+            if chunk and chunk_full:
+                yield chunk
+                chunk = {}
+                chunk_size = 0
+
+            chunk[label] = piece
+            chunk_size += len(piece)
+
+    if chunk:
+        yield chunk
+
+
+async def analyse_chunks(chunks, analyse, config=None, deadline=None, coverage=None):
+    """
+    Runs `analyse(chunk)` on each chunk as it arrives, with at most
+    `max_chunks_in_flight` analyses running. Returns results in chunk order,
+    leaving out chunks that could not be analysed before `deadline`.
+    """
+    config = config or PipelineConfig()
+    coverage = coverage if coverage is not None else Coverage()
+    semaphore = asyncio.Semaphore(config.max_chunks_in_flight)
+    tasks = []
+    # A split file counts as analysed once all of its parts are, and as skipped if any part is
+    analysed_parts = {}
+    skipped_files = set()
+
+    def record(chunk, analysed):
+        for label in chunk:
+            path, _, total = source_file(label)
+            if not analysed:
+                if path not in skipped_files:
+                    skipped_files.add(path)
+                    coverage.skipped += 1
+                continue
+            analysed_parts[path] = analysed_parts.get(path, 0) + 1
+            if analysed_parts[path] == total and path not in skipped_files:
+                coverage.analysed += 1
+
+    async def run(index, chunk):
+        try:
+            if deadline is not None and deadline.expired:
+                record(chunk, analysed=False)
+                return None
+            print(f"Analyzing chunk {index + 1}...")
+            if deadline is None:
+                result = await analyse(chunk)
+            else:
+                result = await asyncio.wait_for(analyse(chunk), deadline.remaining())
+            record(chunk, analysed=True)
+            return result
+        except asyncio.TimeoutError:
+            record(chunk, analysed=False)
+            return None
+        finally:
+            semaphore.release()
+
+    iterator = aiter(chunks)
+    try:
+        while True:
+            # Take a slot before pulling the next chunk so upstream stages wait on us
+            await semaphore.acquire()
+            chunk = await anext(iterator, None)
+            if chunk is None:
+                semaphore.release()
+                break
+            tasks.append(asyncio.create_task(run(len(tasks), chunk)))
+
+        results = await asyncio.gather(*tasks)
+        return [result for result in results if result is not None]
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
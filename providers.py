@@ -0,0 +1,66 @@
+"""
+Lazily loaded LLM provider SDKs.
+
+Importing google.generativeai or semantic_kernel is slow, and most web
+workers never need them to serve status pages. Providers are registered as
+factories here and only imported and configured the first time they are used.
+"""
+import os
+import threading
+from types import SimpleNamespace
+
+_factories = {}
+_providers = {}
+_lock = threading.Lock()
+
+
+def register_provider(name, factory):
+    """Registers a zero-argument factory that imports and configures a provider SDK."""
+    with _lock:
+        _factories[name] = factory
+        _providers.pop(name, None)
+
+
+def get_provider(name):
+    """Returns a provider, importing and configuring its SDK on first use."""
+    provider = _providers.get(name)
+    if provider is not None:
+        return provider
+
+    with _lock:
+        provider = _providers.get(name)
+        if provider is None:
+            if name not in _factories:
+                raise ValueError(f"Unknown LLM provider '{name}'. Registered providers: {', '.join(sorted(_factories))}")
+            provider = _factories[name]()
+            _providers[name] = provider
+        return provider
+
+
+def is_loaded(name):
+    """True once a provider's SDK has been imported."""
+    return name in _providers
+
+
+def _load_gemini():
+    import google.generativeai as genai
+
+    # Configure your Gemini API key
+    genai.configure(api_key=os.getenv("GENAI_API_KEY"))
+    return genai
+
+
+def _load_semantic_kernel_openai():
+    import semantic_kernel as sk
+    from semantic_kernel.connectors.ai.open_ai import OpenAIChatCompletion
+    from semantic_kernel.functions import KernelArguments
+
+    return SimpleNamespace(
+        Kernel=sk.Kernel,
+        OpenAIChatCompletion=OpenAIChatCompletion,
+        KernelArguments=KernelArguments,
+    )
+
+
+register_provider("gemini", _load_gemini)
+register_provider("semantic-kernel-openai", _load_semantic_kernel_openai)
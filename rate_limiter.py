@@ -0,0 +1,248 @@
+import os
+import re
+import time
+import asyncio
+import threading
+from collections import deque
+
+# Default provider quotas as (requests per minute, tokens per minute).
+# Override for every model with LLM_RPM_LIMIT / LLM_TPM_LIMIT.
+DEFAULT_MODEL_QUOTAS = {
+    "gemini-1.5-pro": (360, 2000000),
+    "gpt-3.5-turbo-16k": (3500, 180000),
+}
+FALLBACK_QUOTA = (60, 100000)
+
+# Buckets refill at this fraction of the quota, so the sustained rate stays just under it
+QUOTA_HEADROOM = float(os.getenv("LLM_QUOTA_HEADROOM", 0.9))
+# Burst size as seconds of refill; a full minute would allow about 2x the quota in the first minute
+BURST_SECONDS = float(os.getenv("LLM_BURST_SECONDS", 5))
+
+# Rough characters-per-token ratio used to estimate request size up front
+CHARS_PER_TOKEN = 4
+
+RATE_LIMIT_ERROR_NAMES = ("ResourceExhausted", "RateLimitError", "TooManyRequests")
+# Last resort for SDKs that only report the HTTP status in the message
+RATE_LIMIT_MESSAGE_PATTERN = re.compile(r"\b429\b.*Too Many Requests", re.IGNORECASE)
+
+
+def estimate_tokens(text, expected_output_tokens=1024):
+    """Estimates the tokens a request will consume (prompt plus expected completion)."""
+    return len(text) // CHARS_PER_TOKEN + 1 + expected_output_tokens
+
+
+def is_rate_limit_error(exc):
+    """Returns True if an exception (or anything it wraps) is a provider 429."""
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if type(exc).__name__ in RATE_LIMIT_ERROR_NAMES:
+            return True
+        for attr in ("status_code", "status", "code"):
+            if getattr(exc, attr, None) == 429:
+                return True
+        if RATE_LIMIT_MESSAGE_PATTERN.search(str(exc)):
+            return True
+        exc = exc.__cause__ or exc.__context__
+    return False
+
+
+class TokenBucket:
+    """Thread-safe token bucket; waiting is done with asyncio.sleep so any event loop can use it."""
+
+    def __init__(self, capacity, refill_per_second):
+        self.capacity = float(capacity)
+        self.refill_per_second = float(refill_per_second)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_per_second)
+        self._updated = now
+
+    def try_acquire(self, amount):
+        """Debits the bucket if possible, otherwise returns the seconds to wait."""
+        # A request larger than the bucket would never fit; it waits for a full bucket and
+        # leaves the balance negative, so later requests pay for the excess
+        needed = min(float(amount), self.capacity)
+        with self._lock:
+            self._refill()
+            if self._tokens >= needed:
+                self._tokens -= float(amount)
+                return 0.0
+            return (needed - self._tokens) / self.refill_per_second
+
+    async def acquire(self, amount=1):
+        """Waits until `amount` tokens are available and debits them."""
+        while True:
+            wait = self.try_acquire(amount)
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def drain(self):
+        """Empties the bucket, pausing new requests until it refills."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, 0.0)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit that grows additively on success and shrinks
+    multiplicatively on throttling (AIMD). Safe to share across threads
+    and event loops.
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=16, decrease_factor=0.5, decrease_cooldown=1.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.decrease_cooldown = decrease_cooldown
+        self._limit = float(initial)
+        self._in_flight = 0
+        self._last_decrease = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        return max(self.minimum, int(self._limit))
+
+    @property
+    def in_flight(self):
+        return self._in_flight
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if not self._waiters and self._in_flight < self.limit:
+                self._in_flight += 1
+                return
+            future = loop.create_future()
+            waiter = (loop, future)
+            self._waiters.append(waiter)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif future.done() and not future.cancelled():
+                    # The slot was granted just before we were cancelled
+                    self._in_flight -= 1
+                    self._wake_waiters()
+            raise
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake_waiters()
+
+    def set_maximum(self, maximum):
+        """Caps the concurrency limit, e.g. to share one global LLM budget across many jobs."""
+        with self._lock:
+            self.maximum = max(self.minimum, maximum)
+            self._limit = min(self._limit, float(self.maximum))
+
+    def on_success(self):
+        """Additive increase: roughly +1 slot per window of successful requests."""
+        with self._lock:
+            self._limit = min(self.maximum, self._limit + 1.0 / max(self._limit, 1.0))
+            self._wake_waiters()
+
+    def on_throttle(self):
+        """Multiplicative decrease, at most once per cooldown so one burst of 429s halves only once."""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last_decrease >= self.decrease_cooldown:
+                self._limit = max(float(self.minimum), self._limit * self.decrease_factor)
+                self._last_decrease = now
+
+    def _wake_waiters(self):
+        while self._waiters and self._in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            if loop.is_closed():
+                continue
+            self._in_flight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+
+class ModelRateLimiter:
+    """Request bucket, token bucket and adaptive concurrency for a single model."""
+
+    def __init__(self, model, requests_per_minute, tokens_per_minute, max_concurrency=16, max_retries=5,
+                 headroom=QUOTA_HEADROOM, burst_seconds=BURST_SECONDS):
+        self.model = model
+        self.requests = self._bucket(requests_per_minute, headroom, burst_seconds)
+        self.tokens = self._bucket(tokens_per_minute, headroom, burst_seconds)
+        self.concurrency = AdaptiveConcurrencyLimiter(initial=min(4, max_concurrency), maximum=max_concurrency)
+        self.max_retries = max_retries
+
+    @staticmethod
+    def _bucket(per_minute, headroom, burst_seconds):
+        refill_per_second = per_minute / 60.0 * headroom
+        return TokenBucket(refill_per_second * burst_seconds, refill_per_second)
+
+    async def run(self, request_factory, prompt="", estimated_tokens=None):
+        """
+        Runs `request_factory()` (a coroutine factory) once quota allows,
+        retrying with backoff when the provider answers with a 429.
+        """
+        if estimated_tokens is None:
+            estimated_tokens = estimate_tokens(prompt)
+
+        attempt = 0
+        while True:
+            await self.concurrency.acquire()
+            try:
+                await self.requests.acquire(1)
+                await self.tokens.acquire(estimated_tokens)
+                result = await request_factory()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                self.concurrency.on_throttle()
+                self.requests.drain()
+            else:
+                self.concurrency.on_success()
+                return result
+            finally:
+                self.concurrency.release()
+
+            attempt += 1
+            backoff = min(30.0, 2 ** attempt)
+            print(f"Rate limited by {self.model}, retrying in {backoff:.0f}s (attempt {attempt})...")
+            await asyncio.sleep(backoff)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _model_quota(model):
+    rpm, tpm = DEFAULT_MODEL_QUOTAS.get(model, FALLBACK_QUOTA)
+    rpm = int(os.getenv("LLM_RPM_LIMIT", rpm))
+    tpm = int(os.getenv("LLM_TPM_LIMIT", tpm))
+    return rpm, tpm
+
+
+def get_rate_limiter(model):
+    """Returns the process-wide rate limiter for a model, creating it on first use."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            rpm, tpm = _model_quota(model)
+            max_concurrency = int(os.getenv("LLM_MAX_CONCURRENCY", 16))
+            limiter = ModelRateLimiter(model, rpm, tpm, max_concurrency=max_concurrency)
+            _limiters[model] = limiter
+        return limiter
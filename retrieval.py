@@ -0,0 +1,238 @@
+"""
+Question-driven analysis over a local BM25 index of repository code.
+
+Files are split into overlapping line windows and indexed with a sparse
+BM25 weight matrix (SciPy). A question is answered by scoring every chunk in
+one sparse matrix-vector product, taking the top-k chunks and prompting the
+LLM with only those. Indexes are cached per repository, commit and filter
+settings, so follow-up questions about the same commit skip fetching entirely.
+"""
+import os
+import re
+import threading
+from collections import Counter, OrderedDict
+from contextlib import aclosing
+import aiohttp
+import numpy as np
+from scipy import sparse
+from gitagent import (
+    extract_owner_repo, get_file_content, get_head_commit_sha, iter_repo_files,
+    generate_text, HTTP_TIMEOUT
+)
+from path_filters import PathFilter
+from pipeline import PipelineConfig, Coverage, stream_file_contents
+from deadline import Deadline, ANALYSIS_DEADLINE_SECONDS, LISTING_BUDGET
+
+CHUNK_LINES = 60
+CHUNK_OVERLAP = 10
+DEFAULT_TOP_K = 5
+MAX_TOP_K = 20
+INDEX_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 8))
+
+# BM25 parameters
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+")
+_CAMEL_CASE_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|\d+")
+
+
+def tokenize(text):
+    """Splits code or prose into lowercase terms, including the parts of camelCase and snake_case names."""
+    terms = []
+    for identifier in _IDENTIFIER_PATTERN.findall(text):
+        lowered = identifier.lower()
+        if len(lowered) > 1:
+            terms.append(lowered)
+        parts = [part.lower() for piece in identifier.split("_") for part in _CAMEL_CASE_PATTERN.findall(piece)]
+        if len(parts) > 1:
+            terms.extend(part for part in parts if len(part) > 1)
+    return terms
+
+
+def chunk_file(path, content, lines_per_chunk=CHUNK_LINES, overlap=CHUNK_OVERLAP):
+    """Splits a file into overlapping windows of lines, returned as dicts with path, line range and text."""
+    lines = content.splitlines()
+    chunks = []
+    step = max(1, lines_per_chunk - overlap)
+    for start in range(0, max(len(lines), 1), step):
+        window = lines[start:start + lines_per_chunk]
+        chunks.append({
+            "path": path,
+            "start_line": start + 1,
+            "end_line": start + len(window),
+            "text": "\n".join(window),
+        })
+        if start + lines_per_chunk >= len(lines):
+            break
+    return chunks
+
+
+class RepoIndex:
+    """BM25 index over repository chunks backed by a sparse chunk x term weight matrix."""
+
+    def __init__(self, chunks, k1=BM25_K1, b=BM25_B):
+        self.chunks = chunks
+        self.vocabulary = {}
+
+        rows, cols, counts = [], [], []
+        for row, chunk in enumerate(chunks):
+            # Paths are indexed too, so "where is auth handled?" can match auth/ or auth.py
+            term_counts = Counter(tokenize(chunk["path"]) + tokenize(chunk["text"]))
+            for term, count in term_counts.items():
+                rows.append(row)
+                cols.append(self.vocabulary.setdefault(term, len(self.vocabulary)))
+                counts.append(count)
+
+        shape = (len(chunks), len(self.vocabulary))
+        tf = sparse.csr_matrix(
+            (np.asarray(counts, dtype=np.float32), (np.asarray(rows), np.asarray(cols))),
+            shape=shape
+        )
+
+        doc_lengths = np.asarray(tf.sum(axis=1)).ravel()
+        average_length = doc_lengths.mean() if len(doc_lengths) else 1.0
+        document_frequency = np.bincount(tf.indices, minlength=shape[1])
+        idf = np.log1p((shape[0] - document_frequency + 0.5) / (document_frequency + 0.5)).astype(np.float32)
+
+        # Precompute the BM25 weight of every (chunk, term) pair so a query is one sparse product
+        row_of_entry = np.repeat(np.arange(shape[0]), np.diff(tf.indptr))
+        length_norm = k1 * (1 - b + b * doc_lengths[row_of_entry] / max(average_length, 1e-9))
+        tf.data = idf[tf.indices] * tf.data * (k1 + 1) / (tf.data + length_norm)
+        self.weights = tf.tocsc()
+
+    def search(self, query, top_k=DEFAULT_TOP_K):
+        """Returns up to `top_k` (score, chunk) pairs for the query, best first."""
+        term_ids = [self.vocabulary[term] for term in tokenize(query) if term in self.vocabulary]
+        if not term_ids or not self.chunks:
+            return []
+
+        ids, query_counts = np.unique(term_ids, return_counts=True)
+        scores = self.weights[:, ids] @ query_counts.astype(np.float32)
+        scores = np.asarray(scores).ravel()
+
+        top_k = min(top_k, len(scores))
+        if top_k < 1:
+            return []
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+        return [(float(scores[i]), self.chunks[i]) for i in best if scores[i] > 0]
+
+
+_index_cache = OrderedDict()
+_index_cache_lock = threading.Lock()
+
+
+def _cached_index(key):
+    with _index_cache_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+        return index
+
+
+def _cache_index(key, index):
+    with _index_cache_lock:
+        _index_cache[key] = index
+        _index_cache.move_to_end(key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+
+
+async def build_repo_index(session, owner, repo, token, path_filter=None, deadline=None, commit=None):
+    """
+    Fetches a repository's files at `commit` and indexes them. Returns the
+    index and its coverage.
+    """
+    config = PipelineConfig.from_env()
+    coverage = Coverage()
+    deadline = deadline or Deadline(ANALYSIS_DEADLINE_SECONDS)
+    # Every listing and content request reads the same commit the index is cached under
+    paths = iter_repo_files(session, owner, repo, "", token, config.max_file_size, path_filter, ref=commit)
+    fetch = lambda path: get_file_content(session, owner, repo, path, token, ref=commit)
+    files = stream_file_contents(
+        paths, fetch, config,
+        listing_deadline=deadline.until(LISTING_BUDGET),
+        fetch_deadline=deadline,
+        coverage=coverage
+    )
+
+    chunks = []
+    async with aclosing(files):
+        async for path, content in files:
+            chunks.extend(chunk_file(path, content))
+
+    coverage.analysed = coverage.fetched
+    return RepoIndex(chunks), coverage
+
+
+def build_question_prompt(repo_url, question, results):
+    """Builds a prompt containing only the retrieved chunks."""
+    snippets = "\n\n".join(
+        f"--- {chunk['path']} (lines {chunk['start_line']}-{chunk['end_line']}) ---\n{chunk['text']}"
+        for _, chunk in results
+    )
+    return f"""
+    Answer the following question about the GitHub repository {repo_url}.
+    Use only the code excerpts below, cite file paths and line numbers, and say
+    so if the excerpts do not contain the answer.
+
+    Question: {question}
+
+    Relevant code:
+    {snippets}
+    """
+
+
+async def ask_repository(repo_url, question, token=None, top_k=DEFAULT_TOP_K, path_filter=None):
+    """
+    Answers a question about a repository using the top-k retrieved chunks.
+
+    Without a `path_filter`, the repository's configured filter (and its
+    .gitignore/.gitattributes rules) is used. Returns a dict with the answer,
+    the source chunks used and the commit the index was built from, or a dict
+    with an "error" message and the HTTP "status" that best describes it.
+    """
+    owner, repo = extract_owner_repo(repo_url)
+    if not owner or not repo:
+        return {"error": "Invalid GitHub URL format.", "status": 400}
+    path_filter = path_filter or PathFilter.for_repo(repo_url)
+
+    async with aiohttp.ClientSession(timeout=HTTP_TIMEOUT) as session:
+        commit = await get_head_commit_sha(session, owner, repo, token)
+        # Indexes built with different filter settings cover different files
+        cache_key = (owner, repo, commit, path_filter.settings_key)
+        index = _cached_index(cache_key) if commit else None
+        cached = index is not None
+
+        if index is None:
+            print(f"Building retrieval index for {owner}/{repo}@{commit}...")
+            index, coverage = await build_repo_index(session, owner, repo, token, path_filter, commit=commit)
+            # Only complete indexes are reused; a partial one is rebuilt on the next question
+            if commit and not coverage.partial:
+                _cache_index(cache_key, index)
+
+    if not index.chunks:
+        return {"error": "No files found or access denied.", "status": 404, "commit": commit}
+
+    results = index.search(question, top_k)
+    if not results:
+        return {"answer": "No code in the repository matches this question.", "sources": [], "commit": commit,
+                "cached": cached}
+
+    try:
+        answer = await generate_text(build_question_prompt(repo_url, question, results))
+    except Exception as e:
+        # The LLM provider failed, not this service
+        return {"error": f"Error generating answer: {e}", "status": 502, "commit": commit}
+
+    return {
+        "answer": answer,
+        "sources": [
+            {"path": chunk["path"], "start_line": chunk["start_line"], "end_line": chunk["end_line"],
+             "score": round(score, 3)}
+            for score, chunk in results
+        ],
+        "commit": commit,
+        "cached": cached,
+    }
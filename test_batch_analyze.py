@@ -0,0 +1,114 @@
+import asyncio
+import json
+
+import pytest
+
+pytest.importorskip("aiohttp")
+
+import batch_analyze
+from batch_analyze import ResultWriter, analyze_job, load_completed, load_jobs, run_batch
+from deadline import Deadline, NO_SUMMARY_DETAIL, partial_analysis_note
+from pipeline import Coverage
+
+
+def run_job(monkeypatch, tmp_path, result):
+    async def fake_summarize(repo_url, token=None, **kwargs):
+        return result
+
+    monkeypatch.setattr(batch_analyze, "summarize_repo_with_content", fake_summarize)
+    output_path = tmp_path / "results.jsonl"
+
+    async def scenario():
+        writer = ResultWriter(output_path)
+        try:
+            job = {"id": "octo/demo", "repo_url": "https://github.com/octo/demo"}
+            return await analyze_job(None, job, None, asyncio.Semaphore(1), writer)
+        finally:
+            writer.close()
+
+    status = asyncio.run(scenario())
+    record = json.loads(output_path.read_text().splitlines()[-1])
+    return status, record, output_path
+
+
+def test_result_without_summary_is_retried(monkeypatch, tmp_path):
+    coverage = Coverage(listed=3, fetched=3, skipped=3)
+    result = partial_analysis_note(Deadline(60), coverage, NO_SUMMARY_DETAIL) + "- a.py\n- b.py\n- c.py"
+
+    status, record, output_path = run_job(monkeypatch, tmp_path, result)
+    assert status == "partial"
+    assert record["partial"] is True
+    assert load_completed(output_path) == set()
+
+
+def test_partial_summary_is_completed(monkeypatch, tmp_path):
+    coverage = Coverage(listed=3, fetched=2, analysed=2, skipped=1)
+    result = partial_analysis_note(Deadline(60), coverage) + "## Summary\nLooks fine."
+
+    status, record, output_path = run_job(monkeypatch, tmp_path, result)
+    assert status == "completed"
+    assert record["partial"] is True
+    assert load_completed(output_path) == {"octo/demo"}
+
+
+def test_error_result_is_failed(monkeypatch, tmp_path):
+    status, record, output_path = run_job(monkeypatch, tmp_path, "Error: no files could be retrieved")
+    assert status == "failed"
+    assert record["partial"] is False
+    assert load_completed(output_path) == set()
+
+
+def test_load_jobs_skips_bad_lines(tmp_path):
+    input_path = tmp_path / "repos.jsonl"
+    input_path.write_text("\n".join([
+        json.dumps({"repo_url": "https://github.com/octo/one", "exclude": ["docs/"]}),
+        "",
+        "{not json",
+        json.dumps({"name": "no url"}),
+        json.dumps({"url": "https://github.com/octo/two", "id": "two"}),
+        '{"repo_url": "https://github.com/octo/thr',  # truncated last line
+    ]))
+
+    jobs = load_jobs(input_path)
+    assert [(job["id"], job["repo_url"]) for job in jobs] == [
+        ("https://github.com/octo/one", "https://github.com/octo/one"),
+        ("two", "https://github.com/octo/two"),
+    ]
+    assert jobs[0]["exclude"] == ["docs/"]
+
+
+def test_load_completed_ignores_truncated_last_line(tmp_path):
+    output_path = tmp_path / "results.jsonl"
+    output_path.write_text("\n".join([
+        json.dumps({"id": "one", "status": "completed"}),
+        json.dumps({"id": "two", "status": "failed"}),
+        json.dumps({"id": "three", "status": "partial"}),
+        '{"id": "four", "status": "comp',  # the process died while writing this record
+    ]))
+
+    assert load_completed(output_path) == {"one"}
+    assert load_completed(tmp_path / "missing.jsonl") == set()
+
+
+def test_resume_runs_only_pending_jobs(monkeypatch, tmp_path):
+    analysed = []
+
+    async def fake_summarize(repo_url, token=None, **kwargs):
+        analysed.append(repo_url)
+        return "## Summary"
+
+    monkeypatch.setattr(batch_analyze, "summarize_repo_with_content", fake_summarize)
+    input_path = tmp_path / "repos.jsonl"
+    input_path.write_text("\n".join(json.dumps({"repo_url": f"https://github.com/octo/{name}"})
+                                     for name in ("one", "two", "three")))
+    output_path = tmp_path / "results.jsonl"
+    output_path.write_text(
+        json.dumps({"id": "https://github.com/octo/one", "status": "completed"}) + "\n"
+        + '{"id": "https://github.com/octo/two", "sta'
+    )
+
+    summary = asyncio.run(run_batch(input_path, output_path, concurrency=2))
+    assert summary == {"completed": 2}
+    assert sorted(analysed) == ["https://github.com/octo/three", "https://github.com/octo/two"]
+    # A second run finds everything completed, even after the truncated line
+    assert load_completed(output_path) == {f"https://github.com/octo/{name}" for name in ("one", "two", "three")}
@@ -0,0 +1,93 @@
+import asyncio
+
+from deadline import Deadline, NO_SUMMARY_DETAIL, PARTIAL_ANALYSIS_MARKER, has_no_summary, partial_analysis_note
+from pipeline import PipelineConfig, Coverage, stream_file_contents
+
+
+async def collect(async_iterable):
+    return [item async for item in async_iterable]
+
+
+async def fetch_content(path):
+    return f"# {path}"
+
+
+def test_stage_deadlines_share_the_start():
+    deadline = Deadline(100, start=50.0)
+    assert deadline.until(0.3).expires_at == 80.0
+    assert deadline.until(0.6).expires_at == 110.0
+
+    assert Deadline(0.01, start=0.0).expired
+    assert Deadline(60).near(61)
+    assert not Deadline(60).near(5)
+
+
+def test_listing_deadline_keeps_files_found_so_far():
+    async def paths():
+        yield "a.py"
+        yield "b.py"
+        await asyncio.Event().wait()  # The listing hangs, e.g. on a huge directory
+        yield "never.py"
+
+    async def scenario():
+        coverage = Coverage()
+        files = await collect(stream_file_contents(
+            paths(), fetch_content, PipelineConfig(), listing_deadline=Deadline(0.1), coverage=coverage
+        ))
+        return files, coverage
+
+    files, coverage = asyncio.run(scenario())
+    assert sorted(path for path, _ in files) == ["a.py", "b.py"]
+    assert coverage == Coverage(listed=2, fetched=2, listing_complete=False)
+    assert coverage.partial
+
+    note = partial_analysis_note(Deadline(60), coverage)
+    assert note.startswith(PARTIAL_ANALYSIS_MARKER)
+    assert "Listed 2 files (listing incomplete), fetched 2, analysed 0, skipped 0" in note
+
+
+def test_fetch_deadline_counts_skipped_files():
+    async def fetch(path):
+        if path == "slow.py":
+            await asyncio.sleep(10)
+        return await fetch_content(path)
+
+    async def paths():
+        for path in ("a.py", "slow.py", "b.py"):
+            yield path
+
+    async def scenario():
+        coverage = Coverage()
+        files = await collect(stream_file_contents(
+            paths(), fetch, PipelineConfig(fetch_concurrency=1), fetch_deadline=Deadline(0.1), coverage=coverage
+        ))
+        return files, coverage
+
+    files, coverage = asyncio.run(scenario())
+    # slow.py times out and b.py arrives after the deadline; both are skipped, not lost silently
+    assert [path for path, _ in files] == ["a.py"]
+    assert coverage == Coverage(listed=3, fetched=1, skipped=2)
+
+    note = partial_analysis_note(Deadline(60), coverage, "Extra detail.")
+    assert "Listed 3 files (listing complete), fetched 1, analysed 0, skipped 2 for lack of time. Extra detail." in note
+    assert note.endswith("\n\n")
+
+
+def test_complete_run_is_not_partial():
+    async def paths():
+        yield "a.py"
+
+    coverage = Coverage()
+    asyncio.run(collect(stream_file_contents(
+        paths(), fetch_content, listing_deadline=Deadline(60), fetch_deadline=Deadline(60), coverage=coverage
+    )))
+    assert coverage == Coverage(listed=1, fetched=1)
+    assert not coverage.partial
+
+
+def test_has_no_summary():
+    coverage = Coverage(listed=2, fetched=2, skipped=2)
+    assert has_no_summary(partial_analysis_note(Deadline(60), coverage, NO_SUMMARY_DETAIL) + "- a.py\n- b.py")
+    assert not has_no_summary(partial_analysis_note(Deadline(60), coverage) + "## Summary")
+    # The detail only counts in the note itself, not quoted in a summary
+    assert not has_no_summary(f"## Summary\n{NO_SUMMARY_DETAIL}")
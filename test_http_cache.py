@@ -0,0 +1,144 @@
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("markdown2")
+pytest.importorskip("aiohttp")
+
+import webhook_listener
+from http_cache import GZIP_MIN_BYTES, next_result_version
+
+REPO_URL = "https://github.com/octo/demo"
+
+
+def store_result(analysis="All good.", timestamp="2026-10-19 10:00:00 UTC"):
+    """Stores a record with the same keys /analyze and /webhook write."""
+    webhook_listener.analysis_results[REPO_URL] = {
+        "version": next_result_version(),
+        "timestamp": timestamp,
+        "result": analysis,
+        "commit_message": "Fix parser",
+        "commit_author": "octocat",
+        "partial": False,
+    }
+
+
+@pytest.fixture
+def client():
+    webhook_listener.analysis_results.clear()
+    yield webhook_listener.app.test_client()
+    webhook_listener.analysis_results.clear()
+
+
+def test_unchanged_result_revalidates_with_304(client):
+    store_result()
+    first = client.get(f"/status/{REPO_URL}")
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+    etag = first.headers["ETag"]
+
+    second = client.get(f"/status/{REPO_URL}", headers={"If-None-Match": etag})
+    assert second.status_code == 304
+    assert second.data == b""
+    assert second.headers["ETag"] == etag
+
+
+def test_weakened_etag_still_revalidates(client):
+    # Proxies that compress responses (e.g. nginx with gzip on) turn strong ETags into weak ones
+    store_result()
+    etag = client.get(f"/status/{REPO_URL}").headers["ETag"]
+    response = client.get(f"/status/{REPO_URL}", headers={"If-None-Match": f"W/{etag}"})
+    assert response.status_code == 304
+
+
+def test_new_result_changes_etag(client):
+    store_result()
+    etag = client.get(f"/status/{REPO_URL}").headers["ETag"]
+
+    # Same content stored again (e.g. a re-run) is still a new version
+    store_result()
+    response = client.get(f"/status/{REPO_URL}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+
+def test_fields_projection(client):
+    store_result()
+    response = client.get(f"/status/{REPO_URL}?fields=status,result.timestamp,result.partial")
+    assert response.get_json() == {
+        "status": "completed",
+        "result": {"timestamp": "2026-10-19 10:00:00 UTC", "partial": False},
+    }
+
+    # Different projections are different representations
+    full = client.get(f"/status/{REPO_URL}")
+    assert full.headers["ETag"] != response.headers["ETag"]
+    record = full.get_json()["result"]
+    assert record["result"] == "All good."
+    assert record["commit_author"] == "octocat"
+
+
+def test_large_bodies_are_gzipped_when_accepted(client):
+    store_result(analysis="x" * (GZIP_MIN_BYTES * 4))
+    response = client.get(f"/status/{REPO_URL}", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    payload = json.loads(gzip.decompress(response.data))
+    assert payload["result"]["result"] == "x" * (GZIP_MIN_BYTES * 4)
+
+    revalidated = client.get(
+        f"/status/{REPO_URL}",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]},
+    )
+    assert revalidated.status_code == 304
+
+    plain = client.get(f"/status/{REPO_URL}")
+    assert "Content-Encoding" not in plain.headers
+    assert plain.get_json()["result"]["result"] == payload["result"]["result"]
+
+
+def test_small_bodies_are_not_gzipped(client):
+    store_result()
+    response = client.get(f"/status/{REPO_URL}", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_api_results_projection():
+    import app
+
+    app.analysis_results[REPO_URL] = {
+        "version": next_result_version(),
+        "timestamp": "2026-10-19 10:00:00 UTC",
+        "result": "All good.",
+    }
+    try:
+        client = app.app.test_client()
+        response = client.get(f"/api/results/{REPO_URL}?fields=timestamp")
+        assert response.get_json() == {"timestamp": "2026-10-19 10:00:00 UTC"}
+        revalidated = client.get(
+            f"/api/results/{REPO_URL}?fields=timestamp", headers={"If-None-Match": response.headers["ETag"]}
+        )
+        assert revalidated.status_code == 304
+    finally:
+        app.analysis_results.clear()
+
+
+def test_missing_result(client):
+    response = client.get(f"/status/{REPO_URL}")
+    assert response.status_code == 404
+    assert response.get_json() == {"status": "not_found"}
+
+
+def test_versions_do_not_repeat_across_processes():
+    code = "import http_cache; print(http_cache.next_result_version())"
+    versions = {
+        subprocess.run([sys.executable, "-c", code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                       capture_output=True, text=True, check=True).stdout.strip()
+        for _ in range(2)
+    }
+    assert len(versions) == 2
@@ -0,0 +1,128 @@
+import pytest
+
+from path_filters import PathFilter, PathRule
+
+
+def test_unanchored_pattern_matches_at_any_depth():
+    rule = PathRule("*.log")
+    assert rule.matches("debug.log")
+    assert rule.matches("a/b/debug.log")
+    assert not rule.matches("debug.log.txt")
+
+
+def test_anchored_pattern_is_relative_to_root():
+    rule = PathRule("/dist")
+    assert rule.matches("dist", is_dir=True)
+    assert not rule.matches("pkg/dist", is_dir=True)
+
+    rule = PathRule("docs/*.md")
+    assert rule.matches("docs/index.md")
+    assert not rule.matches("src/docs/index.md")
+    assert not rule.matches("docs/api/index.md")
+
+
+def test_dir_only_rule_ignores_files():
+    rule = PathRule("build/")
+    assert rule.matches("build", is_dir=True)
+    assert rule.matches("pkg/build", is_dir=True)
+    assert not rule.matches("build")
+
+
+def test_double_star():
+    assert PathRule("**/fixtures").matches("fixtures", is_dir=True)
+    assert PathRule("**/fixtures").matches("tests/unit/fixtures", is_dir=True)
+    assert PathRule("vendor/**").matches("vendor/lib/a.js")
+    assert PathRule("vendor/**").matches("vendor", is_dir=True)
+    assert PathRule("src/**/test_*.py").matches("src/test_a.py")
+    assert PathRule("src/**/test_*.py").matches("src/pkg/sub/test_a.py")
+    assert not PathRule("src/**/test_*.py").matches("lib/test_a.py")
+
+
+def test_gitignore_negation_last_match_wins():
+    path_filter = PathFilter()
+    path_filter.add_gitignore("*.log\n!keep.log\n# comment\n")
+    assert not path_filter.allows_file("a/debug.log")
+    assert path_filter.allows_file("a/keep.log")
+
+
+def test_gitignore_ignored_directory_is_not_walked():
+    path_filter = PathFilter()
+    path_filter.add_gitignore("node_modules/\n/dist\n")
+    assert not path_filter.allows_dir("node_modules")
+    assert not path_filter.allows_dir("web/node_modules")
+    assert not path_filter.allows_dir("dist")
+    assert path_filter.allows_dir("web/dist")
+
+
+def test_nested_gitignore_applies_below_its_directory_only():
+    path_filter = PathFilter()
+    path_filter.add_rules_file("pkg/.gitignore", "*.tmp\n/local\n")
+    assert not path_filter.allows_file("pkg/a.tmp")
+    assert not path_filter.allows_file("pkg/sub/a.tmp")
+    assert path_filter.allows_file("a.tmp")
+    assert not path_filter.allows_dir("pkg/local")
+    assert path_filter.allows_dir("local")
+    assert path_filter.allows_dir("pkg/sub/local")
+
+
+def test_gitattributes_linguist_rules():
+    path_filter = PathFilter()
+    path_filter.add_rules_file(".gitattributes", "\n".join([
+        "third_party/** linguist-vendored",
+        "*.pb.go linguist-generated=true",
+        "api/keep.pb.go linguist-generated=false",
+        "gen/*.py linguist-generated",
+        "gen/ok.py -linguist-generated",
+        "*.txt text eol=lf",
+    ]))
+    assert not path_filter.allows_dir("third_party")
+    assert not path_filter.allows_file("api/service.pb.go")
+    assert path_filter.allows_file("api/keep.pb.go")
+    assert not path_filter.allows_file("gen/models.py")
+    assert path_filter.allows_file("gen/ok.py")
+    assert path_filter.allows_file("notes.txt")
+
+
+def test_exclude_prunes_directories():
+    path_filter = PathFilter(exclude="docs/, *.min.js")
+    assert not path_filter.allows_dir("docs")
+    assert not path_filter.allows_file("static/app.min.js")
+    assert path_filter.allows_file("static/app.js")
+
+
+def test_include_prunes_directories_it_cannot_reach():
+    path_filter = PathFilter(include="src/**, tools/*.py")
+    assert path_filter.allows_dir("src")
+    assert path_filter.allows_dir("src/deep/er")
+    assert path_filter.allows_dir("tools")
+    assert not path_filter.allows_dir("tools/sub")
+    assert not path_filter.allows_dir("docs")
+    assert not path_filter.allows_dir("vendor/src")
+
+    assert path_filter.allows_file("src/deep/a.go")
+    assert path_filter.allows_file("tools/build.py")
+    assert not path_filter.allows_file("README.md")
+
+
+def test_include_matching_directory_covers_its_subtree():
+    path_filter = PathFilter(include="docs/api")
+    assert path_filter.allows_dir("docs")
+    assert path_filter.allows_dir("docs/api/v1")
+    assert not path_filter.allows_dir("docs/guides")
+    assert path_filter.allows_file("docs/api/v1/index.md")
+
+
+def test_unanchored_include_cannot_prune():
+    path_filter = PathFilter(include="*.py")
+    assert path_filter.allows_dir("anything/at/all")
+    assert not path_filter.allows_file("anything/readme.md")
+
+
+def test_languages():
+    path_filter = PathFilter(languages="python, .vue")
+    assert path_filter.allows_file("a/b.py")
+    assert path_filter.allows_file("App.vue")
+    assert not path_filter.allows_file("main.go")
+
+    with pytest.raises(ValueError):
+        PathFilter(languages="klingon")
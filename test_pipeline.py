@@ -0,0 +1,183 @@
+import asyncio
+
+import pytest
+
+from pipeline import (
+    PipelineConfig, Coverage, stream_file_contents, pack_chunks, analyse_chunks, split_content, source_file
+)
+from deadline import Deadline
+
+
+async def as_async(items):
+    for item in items:
+        yield item
+
+
+async def collect(async_iterable):
+    return [item async for item in async_iterable]
+
+
+def test_split_content_keeps_everything():
+    content = "".join(f"line {i}\n" for i in range(5000))
+    pieces = split_content(content, 1000)
+    assert "".join(pieces) == content
+    assert all(len(piece) <= 1000 for piece in pieces)
+    assert all(piece.endswith("\n") for piece in pieces)
+
+    # Without newlines, pieces are cut at the limit
+    assert split_content("x" * 2500, 1000) == ["x" * 1000, "x" * 1000, "x" * 500]
+
+
+def test_large_file_is_split_across_chunks():
+    config = PipelineConfig(max_chunk_chars=20000)
+    files = [("small.py", "a" * 100), ("big.py", "b" * 50000)]
+    chunks = asyncio.run(collect(pack_chunks(as_async(files), config)))
+
+    parts = {label: content for chunk in chunks for label, content in chunk.items() if label != "small.py"}
+    assert list(parts) == ["big.py (part 1 of 3)", "big.py (part 2 of 3)", "big.py (part 3 of 3)"]
+    assert "".join(parts.values()) == "b" * 50000
+    assert all(sum(map(len, chunk.values())) <= 20000 for chunk in chunks)
+    assert source_file("big.py (part 2 of 3)") == ("big.py", 2, 3)
+    assert source_file("small.py") == ("small.py", 1, 1)
+
+
+def test_split_file_counts_once_in_coverage():
+    async def scenario():
+        config = PipelineConfig(max_chunk_chars=1000)
+        files = [("a.py", "a" * 10), ("big.py", "b" * 2500)]
+        coverage = Coverage()
+        chunks = pack_chunks(as_async(files), config)
+        results = await analyse_chunks(chunks, lambda chunk: asyncio.sleep(0, list(chunk)), config, coverage=coverage)
+        return results, coverage
+
+    results, coverage = asyncio.run(scenario())
+    assert len(results) == 4
+    assert coverage.analysed == 2
+    assert coverage.skipped == 0
+
+
+def test_skipped_part_counts_file_as_skipped():
+    async def analyse(chunk):
+        if "big.py (part 2 of 2)" in chunk:
+            await asyncio.sleep(1)
+        return list(chunk)
+
+    async def scenario():
+        config = PipelineConfig(max_chunk_chars=1000, max_chunks_in_flight=1)
+        coverage = Coverage()
+        chunks = pack_chunks(as_async([("big.py", "b" * 1500)]), config)
+        results = await analyse_chunks(chunks, analyse, config, deadline=Deadline(0.2), coverage=coverage)
+        return results, coverage
+
+    results, coverage = asyncio.run(scenario())
+    assert results == [["big.py (part 1 of 2)"]]
+    assert coverage.analysed == 0
+    assert coverage.skipped == 1
+    assert coverage.partial
+
+
+def test_slow_consumer_pauses_listing_and_fetching():
+    async def scenario():
+        config = PipelineConfig(fetch_concurrency=2, buffer_size=4)
+        coverage = Coverage()
+        fetched = []
+
+        async def fetch(path):
+            fetched.append(path)
+            return "content"
+
+        files = stream_file_contents(as_async(f"file{i}.py" for i in range(1000)), fetch, config, coverage=coverage)
+        first = await anext(files)
+        # Give every stage the chance to run ahead as far as the queues allow
+        for _ in range(50):
+            await asyncio.sleep(0)
+        listed, fetched_count = coverage.listed, len(fetched)
+        await files.aclose()
+        return first, listed, fetched_count
+
+    first, listed, fetched_count = asyncio.run(scenario())
+    assert first == ("file0.py", "content")
+    # Both queues full, plus one item held by each task
+    assert fetched_count <= 4 + 2 + 1
+    assert listed <= fetched_count + 4 + 1
+
+
+def test_closing_the_stream_cancels_fetches():
+    async def scenario():
+        config = PipelineConfig(fetch_concurrency=3, buffer_size=2)
+        started, cancelled = [], []
+
+        async def fetch(path):
+            if path == "fast.py":
+                return "content"
+            started.append(path)
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(path)
+                raise
+
+        paths = as_async(["fast.py", "slow1.py", "slow2.py", "slow3.py", "slow4.py"])
+        files = stream_file_contents(paths, fetch, config)
+        assert await anext(files) == ("fast.py", "content")
+        for _ in range(10):
+            await asyncio.sleep(0)
+        await files.aclose()
+        return started, cancelled
+
+    started, cancelled = asyncio.run(scenario())
+    assert started
+    assert sorted(cancelled) == sorted(started)
+
+
+def test_analysis_limits_chunks_in_flight_and_pulls_lazily():
+    async def scenario():
+        config = PipelineConfig(max_chunks_in_flight=2)
+        pulled = []
+        running = finished = peak = 0
+
+        async def chunks():
+            for i in range(10):
+                pulled.append(i)
+                yield {f"file{i}.py": "x"}
+
+        async def analyse(chunk):
+            nonlocal running, finished, peak
+            running += 1
+            peak = max(peak, running)
+            # A chunk is only pulled once a slot is free
+            assert len(pulled) <= finished + config.max_chunks_in_flight
+            await asyncio.sleep(0.01)
+            running -= 1
+            finished += 1
+            return list(chunk)[0]
+
+        results = await analyse_chunks(chunks(), analyse, config)
+        return results, peak
+
+    results, peak = asyncio.run(scenario())
+    assert results == [f"file{i}.py" for i in range(10)]
+    assert peak == 2
+
+
+def test_cancelling_analysis_cancels_running_chunks():
+    async def scenario():
+        cancelled = []
+
+        async def analyse(chunk):
+            try:
+                await asyncio.Event().wait()
+            except asyncio.CancelledError:
+                cancelled.append(list(chunk)[0])
+                raise
+
+        chunks = as_async([{"a.py": "x"}, {"b.py": "y"}])
+        task = asyncio.create_task(analyse_chunks(chunks, analyse, PipelineConfig(max_chunks_in_flight=4)))
+        for _ in range(10):
+            await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return cancelled
+
+    assert sorted(asyncio.run(scenario())) == ["a.py", "b.py"]
@@ -0,0 +1,248 @@
+import asyncio
+
+import pytest
+
+import rate_limiter
+from rate_limiter import AdaptiveConcurrencyLimiter, ModelRateLimiter, TokenBucket, is_rate_limit_error
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+def test_bucket_wait_time(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    assert bucket.try_acquire(10) == 0
+    assert bucket.try_acquire(5) == pytest.approx(1.0)
+
+    clock.now += 1.0
+    assert bucket.try_acquire(5) == 0
+    assert bucket.try_acquire(1) == pytest.approx(0.2)
+
+
+def test_bucket_clamps_oversized_requests(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    bucket.try_acquire(10)
+    # A request larger than the bucket waits for a full bucket instead of forever
+    assert bucket.try_acquire(100) == pytest.approx(2.0)
+
+
+def test_oversized_request_is_paid_back(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    assert bucket.try_acquire(25) == 0
+    # 15 tokens of debt plus the next token: (15 + 1) / 5 seconds
+    assert bucket.try_acquire(1) == pytest.approx(3.2)
+
+
+def test_drain_empties_bucket(clock):
+    bucket = TokenBucket(capacity=10, refill_per_second=5)
+    bucket.drain()
+    assert bucket.try_acquire(1) == pytest.approx(0.2)
+
+
+def test_model_buckets_stay_under_quota(clock):
+    limiter = ModelRateLimiter("model", requests_per_minute=600, tokens_per_minute=60000)
+    # 90% of 10 requests/s, bursting at most 5 seconds' worth
+    assert limiter.requests.refill_per_second == pytest.approx(9)
+    assert limiter.requests.capacity == pytest.approx(45)
+
+    # Everything granted in the first minute stays below the quota
+    granted = 0
+    for _ in range(60 * 100):
+        if limiter.requests.try_acquire(1) == 0:
+            granted += 1
+        clock.now += 0.01
+    assert granted < 600
+
+
+def test_throttle_halves_once_per_cooldown(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=8, maximum=16, decrease_cooldown=1.0)
+    limiter.on_throttle()
+    assert limiter.limit == 4
+
+    # A burst of 429s within the cooldown only counts once
+    limiter.on_throttle()
+    assert limiter.limit == 4
+
+    clock.now += 1.5
+    limiter.on_throttle()
+    assert limiter.limit == 2
+
+
+def test_throttle_never_goes_below_minimum(clock):
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, decrease_cooldown=0)
+    limiter.on_throttle()
+    assert limiter.limit == 1
+
+
+def test_success_grows_about_one_slot_per_window():
+    limiter = AdaptiveConcurrencyLimiter(initial=4, maximum=16)
+    # +1/limit per success: 4 -> 4.25 -> 4.49 -> 4.71 -> 4.92 -> 5.12
+    for _ in range(4):
+        limiter.on_success()
+    assert limiter.limit == 4
+    limiter.on_success()
+    assert limiter.limit == 5
+
+
+def test_success_is_capped_at_maximum():
+    limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=3)
+    for _ in range(50):
+        limiter.on_success()
+    assert limiter.limit == 3
+
+
+def test_cancelled_waiter_does_not_leak_slot():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, maximum=1)
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        limiter.release()
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.acquire(), 1)
+        assert limiter.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_waiter_cancelled_after_grant_does_not_leak_slot():
+    async def scenario():
+        limiter = AdaptiveConcurrencyLimiter(initial=1, maximum=1)
+        await limiter.acquire()
+
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+
+        # The slot is handed to the waiter, which is cancelled before the grant runs
+        limiter.release()
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        await asyncio.sleep(0)
+
+        assert limiter.in_flight == 0
+        await asyncio.wait_for(limiter.acquire(), 1)
+
+    asyncio.run(scenario())
+
+
+def test_rate_limit_detection():
+    class ResourceExhausted(Exception):
+        pass
+
+    class HTTPError(Exception):
+        status_code = 429
+
+    wrapped = RuntimeError("service call failed")
+    wrapped.__cause__ = HTTPError()
+
+    assert is_rate_limit_error(ResourceExhausted("quota"))
+    assert is_rate_limit_error(HTTPError())
+    assert is_rate_limit_error(wrapped)
+    assert is_rate_limit_error(Exception("HTTP 429 Too Many Requests"))
+    assert not is_rate_limit_error(ValueError("Exception retrieving src/429_handler.py"))
+    assert not is_rate_limit_error(ValueError("Timeout after 429 ms"))
+
+
+class Throttled(Exception):
+    status_code = 429
+
+
+@pytest.fixture
+def sleeps(clock, monkeypatch):
+    """Records asyncio.sleep calls made by the limiter and advances the fake clock instead of waiting."""
+    calls = []
+    real_sleep = asyncio.sleep
+
+    async def fake_sleep(seconds):
+        calls.append(seconds)
+        clock.now += seconds
+        await real_sleep(0)
+
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", fake_sleep)
+    return calls
+
+
+def test_run_retries_after_429(sleeps):
+    limiter = ModelRateLimiter("model", requests_per_minute=600, tokens_per_minute=6000, max_concurrency=8)
+    calls = []
+
+    async def request():
+        calls.append(limiter.concurrency.in_flight)
+        if len(calls) == 1:
+            raise Throttled("slow down")
+        return "ok"
+
+    assert asyncio.run(limiter.run(request, estimated_tokens=400)) == "ok"
+    assert calls == [1, 1]
+    # Backoff, then the retry waits for its tokens: 450 - 400 + 2s of refill (180) leaves 230 of 400
+    assert sleeps == [2, pytest.approx(170 / 90)]
+    assert limiter.concurrency.in_flight == 0
+    # Halved from 4 by the 429, then +1/2 for the success
+    assert limiter.concurrency.limit == 2
+    # The 429 drained the request bucket, which refilled for 3.89s before the retry took one request
+    assert limiter.requests.try_acquire(45) == pytest.approx((45 - (2 + 170 / 90) * 9 + 1) / 9)
+    # Both attempts paid for their tokens, leaving the token bucket empty
+    assert limiter.tokens.try_acquire(450) == pytest.approx(5.0)
+
+
+def test_run_success_grows_limit(sleeps):
+    limiter = ModelRateLimiter("model", requests_per_minute=600, tokens_per_minute=60000)
+
+    async def request():
+        return "ok"
+
+    async def scenario():
+        for _ in range(5):
+            await limiter.run(request, estimated_tokens=10)
+
+    asyncio.run(scenario())
+    assert limiter.concurrency.limit == 5
+    assert limiter.concurrency.in_flight == 0
+    assert sleeps == []
+
+
+def test_run_gives_up_after_max_retries(sleeps):
+    limiter = ModelRateLimiter("model", requests_per_minute=600, tokens_per_minute=60000, max_retries=2)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        raise Throttled("slow down")
+
+    with pytest.raises(Throttled):
+        asyncio.run(limiter.run(request, estimated_tokens=10))
+    assert len(calls) == 3
+    assert limiter.concurrency.in_flight == 0
+
+
+def test_run_does_not_retry_other_errors(sleeps):
+    limiter = ModelRateLimiter("model", requests_per_minute=600, tokens_per_minute=60000)
+    calls = []
+
+    async def request():
+        calls.append(1)
+        raise ValueError("bad prompt")
+
+    with pytest.raises(ValueError):
+        asyncio.run(limiter.run(request, estimated_tokens=10))
+    assert len(calls) == 1
+    assert limiter.concurrency.limit == 4
+    assert limiter.concurrency.in_flight == 0
@@ -0,0 +1,147 @@
+import asyncio
+import math
+from collections import Counter
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("scipy")
+
+import retrieval
+from pipeline import Coverage
+from retrieval import BM25_B, BM25_K1, RepoIndex, ask_repository, chunk_file, tokenize
+
+REPO_URL = "https://github.com/octo/demo"
+
+
+def make_chunk(path, text):
+    return {"path": path, "start_line": 1, "end_line": text.count("\n") + 1, "text": text}
+
+
+CHUNKS = [
+    make_chunk("auth/login.py", "def login(user, password):\n    check_password(user, password)\n    return session"),
+    make_chunk("auth/tokens.py", "def refresh_token(token):\n    return sign(token)"),
+    make_chunk("db/models.py", "class User:\n    name = Column()\n    password_hash = Column()"),
+    make_chunk("README.md", "Run the server and log in with your user name."),
+]
+
+
+def reference_bm25(chunks, query):
+    """Textbook BM25, computed term by term for comparison."""
+    documents = [Counter(tokenize(chunk["path"]) + tokenize(chunk["text"])) for chunk in chunks]
+    average_length = sum(sum(doc.values()) for doc in documents) / len(documents)
+    scores = []
+    for doc in documents:
+        length = sum(doc.values())
+        score = 0.0
+        for term in tokenize(query):
+            frequency = sum(1 for other in documents if term in other)
+            if not doc[term]:
+                continue
+            idf = math.log(1 + (len(documents) - frequency + 0.5) / (frequency + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            score += idf * doc[term] * (BM25_K1 + 1) / (doc[term] + norm)
+        scores.append(score)
+    return scores
+
+
+def test_tokenize_splits_identifiers():
+    assert tokenize("parseHTTPRequest") == ["parsehttprequest", "parse", "http", "request"]
+    assert tokenize("check_password(x)") == ["check_password", "check", "password"]
+
+
+def test_chunk_file_overlapping_windows():
+    content = "\n".join(f"line {i}" for i in range(1, 131))
+    chunks = chunk_file("a.py", content, lines_per_chunk=60, overlap=10)
+    assert [(chunk["start_line"], chunk["end_line"]) for chunk in chunks] == [(1, 60), (51, 110), (101, 130)]
+
+
+def test_search_matches_reference_bm25():
+    index = RepoIndex(CHUNKS)
+    query = "user password"
+    expected = reference_bm25(CHUNKS, query)
+
+    results = index.search(query, top_k=4)
+    ranked = sorted(range(len(CHUNKS)), key=lambda i: -expected[i])
+    assert [chunk["path"] for _, chunk in results] == [CHUNKS[i]["path"] for i in ranked if expected[i] > 0]
+    for score, chunk in results:
+        assert score == pytest.approx(expected[CHUNKS.index(chunk)], rel=1e-4)
+
+
+def test_search_ranks_rare_terms_and_paths():
+    index = RepoIndex(CHUNKS)
+    # "refresh" appears in one chunk only; the path term "auth" narrows to the auth package
+    assert index.search("refresh the token")[0][1]["path"] == "auth/tokens.py"
+    assert {chunk["path"] for _, chunk in index.search("auth")} == {"auth/login.py", "auth/tokens.py"}
+
+
+def test_search_top_k_and_no_match():
+    index = RepoIndex(CHUNKS)
+    assert len(index.search("user password", top_k=1)) == 1
+    assert index.search("user password", top_k=0) == []
+    assert index.search("kubernetes") == []
+
+
+def test_empty_index():
+    index = RepoIndex([])
+    assert index.search("anything") == []
+
+
+@pytest.fixture
+def fake_repo(monkeypatch):
+    """Serves ask_repository from an in-memory set of files instead of GitHub."""
+    files = {}
+
+    async def fake_head_commit(session, owner, repo, token):
+        return None
+
+    async def fake_build_index(session, owner, repo, token, path_filter=None, deadline=None, commit=None):
+        chunks = [chunk for path, content in files.items() for chunk in chunk_file(path, content)]
+        return RepoIndex(chunks), Coverage(listed=len(files), fetched=len(files), analysed=len(files))
+
+    async def fake_generate_text(prompt):
+        return "It uses a token bucket."
+
+    monkeypatch.setattr(retrieval, "get_head_commit_sha", fake_head_commit)
+    monkeypatch.setattr(retrieval, "build_repo_index", fake_build_index)
+    monkeypatch.setattr(retrieval, "generate_text", fake_generate_text)
+    return files
+
+
+def test_ask_invalid_url_is_client_error():
+    answer = asyncio.run(ask_repository("https://example.com/nope", "anything"))
+    assert answer["status"] == 400
+
+
+def test_ask_empty_repository_is_not_found(fake_repo):
+    answer = asyncio.run(ask_repository(REPO_URL, "how is rate limiting done?"))
+    assert answer["error"] == "No files found or access denied."
+    assert answer["status"] == 404
+
+
+def test_ask_llm_failure_is_bad_gateway(fake_repo, monkeypatch):
+    async def failing_generate_text(prompt):
+        raise RuntimeError("provider unavailable")
+
+    fake_repo["limiter.py"] = "class TokenBucket:\n    def acquire(self):\n        pass\n"
+    monkeypatch.setattr(retrieval, "generate_text", failing_generate_text)
+    answer = asyncio.run(ask_repository(REPO_URL, "how does the token bucket work?"))
+    assert answer["status"] == 502
+
+
+def test_ask_answers_from_retrieved_chunks(fake_repo):
+    fake_repo["limiter.py"] = "class TokenBucket:\n    def acquire(self):\n        pass\n"
+    answer = asyncio.run(ask_repository(REPO_URL, "how does the token bucket work?"))
+    assert answer["answer"] == "It uses a token bucket."
+    assert [source["path"] for source in answer["sources"]] == ["limiter.py"]
+
+
+@pytest.mark.parametrize("top_k", [-2, 0, retrieval.MAX_TOP_K + 1, "many"])
+def test_ask_endpoint_rejects_bad_top_k(top_k):
+    pytest.importorskip("flask")
+    pytest.importorskip("markdown2")
+    import webhook_listener
+
+    client = webhook_listener.app.test_client()
+    response = client.post("/ask", json={"repo_url": REPO_URL, "question": "auth?", "top_k": top_k})
+    assert response.status_code == 400
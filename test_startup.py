@@ -0,0 +1,94 @@
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+
+# Generous ceiling for importing the web app; provider SDKs alone take longer than this
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", 1500))
+PROVIDER_MODULES = ("google.generativeai", "semantic_kernel")
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Minimal stand-ins for the provider SDKs, so an eager import shows up even where they aren't installed
+SDK_STUBS = {
+    "google/__init__.py": "",
+    "google/generativeai.py": "def configure(**kwargs):\n    pass\n",
+    "semantic_kernel/__init__.py": "class Kernel:\n    pass\n",
+    "semantic_kernel/connectors/__init__.py": "",
+    "semantic_kernel/connectors/ai/__init__.py": "",
+    "semantic_kernel/connectors/ai/open_ai.py": "class OpenAIChatCompletion:\n    pass\n",
+    "semantic_kernel/functions.py": "class KernelArguments(dict):\n    pass\n",
+}
+
+
+@pytest.fixture
+def sdk_stubs(tmp_path):
+    for relative_path, source in SDK_STUBS.items():
+        path = tmp_path / relative_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(source)
+    return str(tmp_path)
+
+
+def run_python(code, stub_dir):
+    """Runs code in a fresh interpreter with -X importtime, with the SDK stubs importable."""
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([stub_dir, PROJECT_DIR]))
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True, check=True
+    )
+
+
+def trace_imports(code, stub_dir):
+    """Returns {module: cumulative ms} for every module imported while running `code`."""
+    timings = {}
+    for line in run_python(code, stub_dir).stderr.splitlines():
+        match = re.match(r"import time:\s+\d+\s+\|\s+(\d+)\s+\|\s+(\S.*)$", line)
+        if match:
+            timings[match.group(2).strip()] = int(match.group(1)) / 1000
+    return timings
+
+
+def provider_imports(timings):
+    return [name for name in timings if name.startswith(PROVIDER_MODULES)]
+
+
+def test_stubs_are_detected_when_a_provider_is_used(sdk_stubs):
+    # Guards the tests below against passing just because the stubs aren't picked up
+    timings = trace_imports(
+        "import providers; providers.get_provider('gemini'); providers.get_provider('semantic-kernel-openai')",
+        sdk_stubs,
+    )
+    loaded = provider_imports(timings)
+    assert "google.generativeai" in loaded
+    assert "semantic_kernel" in loaded
+
+
+@pytest.mark.parametrize("module", ["gitagent", "webhook_listener"])
+def test_startup_does_not_import_provider_sdks(module, sdk_stubs):
+    pytest.importorskip("aiohttp")
+    if module == "webhook_listener":
+        pytest.importorskip("flask")
+        pytest.importorskip("markdown2")
+
+    loaded = provider_imports(trace_imports(f"import {module}", sdk_stubs))
+    assert not loaded, f"{module} imports provider SDKs at startup: {loaded}"
+
+    run_python(
+        f"import {module}, providers\n"
+        "assert not providers.is_loaded('gemini')\n"
+        "assert not providers.is_loaded('semantic-kernel-openai')",
+        sdk_stubs,
+    )
+
+
+def test_webhook_listener_import_time(sdk_stubs):
+    pytest.importorskip("aiohttp")
+    pytest.importorskip("flask")
+    pytest.importorskip("markdown2")
+
+    timings = trace_imports("import webhook_listener", sdk_stubs)
+    assert timings["webhook_listener"] < STARTUP_BUDGET_MS, (
+        f"Importing webhook_listener took {timings['webhook_listener']:.0f}ms (budget {STARTUP_BUDGET_MS:.0f}ms)"
+    )
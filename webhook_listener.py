@@ -11,6 +11,9 @@ from datetime import datetime
 from functools import wraps
 # Import the required functions from gitagent.py
 from gitagent import summarize_repo_with_content, extract_owner_repo
+from path_filters import PathFilter
+from deadline import PARTIAL_ANALYSIS_MARKER, has_no_summary
+from http_cache import cached_json_response, next_result_version
 
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
@@ -112,18 +115,33 @@ def analyze():
                 flash('Invalid repository URL format', 'error')
                 return redirect(url_for('index'))
 
+            # Optional path filters from the form, falling back to the repository's configured filters
+            filter_fields = {field: request.form.get(field, '').strip() for field in ('include', 'exclude', 'languages')}
+            if any(filter_fields.values()):
+                path_filter = PathFilter.from_dict(filter_fields)
+            else:
+                path_filter = PathFilter.for_repo(repo_url)
+
             # Use the summarize_repo_with_content function from gitagent.py
-            analysis = await summarize_repo_with_content(repo_url, github_token)
+            analysis = await summarize_repo_with_content(repo_url, github_token, path_filter=path_filter)
 
-            if analysis and not analysis.startswith("Error"):
+            if analysis and has_no_summary(analysis):
+                # Keep any earlier result; a list of files is not an analysis
+                flash('Analysis deadline reached before a summary could be generated. Please try again.', 'error')
+            elif analysis and not analysis.startswith("Error"):
                 timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
                 analysis_results[repo_url] = {
+                    'version': next_result_version(),
                     'timestamp': timestamp,
                     'result': analysis,
                     'commit_message': 'Manual Analysis',
-                    'commit_author': request.form.get('username', 'Anonymous')
+                    'commit_author': request.form.get('username', 'Anonymous'),
+                    'partial': analysis.startswith(PARTIAL_ANALYSIS_MARKER)
                 }
-                flash('Repository analysis completed successfully!', 'success')
+                if analysis_results[repo_url]['partial']:
+                    flash('Analysis deadline reached; showing a partial result.', 'warning')
+                else:
+                    flash('Repository analysis completed successfully!', 'success')
             else:
                 flash(f'Analysis failed: {analysis}', 'error')
 
@@ -160,20 +178,26 @@ def webhook():
 
             try:
                 github_token = os.getenv("GITHUB_TOKEN")
-                analysis = await summarize_repo_with_content(repo_url, github_token)
+                path_filter = PathFilter.for_repo(repo_url)
+                analysis = await summarize_repo_with_content(repo_url, github_token, path_filter=path_filter)
 
+                if analysis and has_no_summary(analysis):
+                    return jsonify({"message": "Analysis deadline reached before a summary could be generated"}), 504
                 if analysis and not analysis.startswith("Error"):
                     timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
                     analysis_results[repo_url] = {
+                        'version': next_result_version(),
                         'timestamp': timestamp,
                         'result': analysis,
                         'commit_message': commit_message,
-                        'commit_author': commit_author
+                        'commit_author': commit_author,
+                        'partial': analysis.startswith(PARTIAL_ANALYSIS_MARKER)
                     }
                     return jsonify({
                         "message": "Analysis completed successfully",
                         "repository": repo_url,
                         "timestamp": timestamp,
+                        "partial": analysis_results[repo_url]['partial'],
                         "commit_info": {
                             "author": commit_author,
                             "message": commit_message
@@ -190,6 +214,49 @@ def webhook():
     return asyncio.run(process_webhook())
 
 
+@app.route('/ask', methods=['POST'])
+def ask():
+    """Answers a question about a repository using only the most relevant code chunks."""
+    # Imported here so NumPy/SciPy are only loaded by workers that serve questions
+    from retrieval import ask_repository, DEFAULT_TOP_K, MAX_TOP_K
+
+    data = request.get_json(silent=True) or request.form
+    repo_url = (data.get('repo_url') or '').strip()
+    question = (data.get('question') or '').strip()
+
+    if not repo_url or not is_valid_github_url(repo_url):
+        return jsonify({"message": "A valid GitHub repository URL is required"}), 400
+    if not question:
+        return jsonify({"message": "Please provide a question"}), 400
+
+    try:
+        top_k = int(data.get('top_k', DEFAULT_TOP_K))
+    except (TypeError, ValueError):
+        return jsonify({"message": "top_k must be an integer"}), 400
+    if not 1 <= top_k <= MAX_TOP_K:
+        return jsonify({"message": f"top_k must be between 1 and {MAX_TOP_K}"}), 400
+
+    # Optional path filters from the request, falling back to the repository's configured filters
+    try:
+        filter_fields = {field: data.get(field) for field in ('include', 'exclude', 'languages')}
+        if any(filter_fields.values()):
+            path_filter = PathFilter.from_dict(filter_fields)
+        else:
+            path_filter = PathFilter.for_repo(repo_url)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+
+    try:
+        github_token = os.getenv("GITHUB_TOKEN")
+        answer = asyncio.run(ask_repository(repo_url, question, github_token, top_k, path_filter))
+    except Exception as e:
+        return jsonify({"message": str(e)}), 500
+
+    if "error" in answer:
+        return jsonify({"message": answer["error"]}), answer.get("status", 500)
+    return jsonify(answer), 200
+
+
 @app.route('/clear/<path:repo_url>')
 def clear_analysis(repo_url):
     """Clear a specific analysis result."""
@@ -202,12 +269,18 @@ def clear_analysis(repo_url):
 # Add status endpoint to check analysis progress
 @app.route('/status/<path:repo_url>')
 def analysis_status(repo_url):
-    """Check the status of an analysis."""
-    if repo_url in analysis_results:
-        return jsonify({
-            "status": "completed",
-            "result": analysis_results[repo_url]
-        })
+    """
+    Check the status of an analysis.
+
+    Supports If-None-Match (304 when unchanged) and `?fields=` projection,
+    e.g. `?fields=status,result.timestamp`.
+    """
+    analysis = analysis_results.get(repo_url)
+    if analysis is not None:
+        return cached_json_response(
+            f"status|{repo_url}|{analysis['version']}",
+            lambda: {"status": "completed", "result": analysis}
+        )
     return jsonify({
         "status": "not_found"
     }), 404